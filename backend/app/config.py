@@ -10,11 +10,35 @@ class Settings(BaseSettings):
 
     # 数据库配置
     DATABASE_PATH: str = "./data/chat.db"
+    # SQLite 连接参数（每个连接建立时通过 PRAGMA 应用）
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT: int = 5000  # 毫秒
+    SQLITE_CACHE_SIZE: int = -65536  # 负数表示 KiB，即 64 MiB
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MiB
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    # 新建数据库时生效；已有数据库需运行 migrations/enable_incremental_vacuum.py
+    SQLITE_AUTO_VACUUM: str = "INCREMENTAL"
 
     # 安全配置
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_HOURS: int = 24
+    # 已验证 Token 缓存容量
+    TOKEN_CACHE_SIZE: int = 4096
+    # 用户信息缓存容量
+    USER_CACHE_SIZE: int = 4096
+    # 新密码哈希的 PBKDF2 迭代次数，修改后旧哈希在下次登录时自动升级
+    PASSWORD_HASH_ITERATIONS: int = 100000
+    # 密码哈希线程池大小（同时计算的哈希数上限），超出的请求排队等待
+    PASSWORD_HASH_WORKERS: int = 2
+
+    # 分词器：模型前缀到词表名的映射（如 "gpt-4o=o200k_base,qwen=qwen2"），
+    # 词表为 TOKENIZER_DIR 下的 <词表名>.tiktoken 或 <词表名>.json；未匹配的模型按字符估算
+    TOKENIZER_MODELS: str = ""
+    TOKENIZER_DIR: str = ""
+    # 消息 token 数缓存容量（按内容哈希）
+    TOKEN_COUNT_CACHE_SIZE: int = 8192
 
     # 管理员配置
     ADMIN_USERNAME: str = "admin"
@@ -23,9 +47,58 @@ class Settings(BaseSettings):
     # 限流配置
     GUEST_RPM: int = 10
     USER_RPM: int = 60
+    # 突发系数：0 表示滑动窗口（任意 60 秒内最多 RPM 次）；大于 0 时改用 GCRA 平滑限流，
+    # 允许瞬时突发 RPM × 系数 次，任意 60 秒内最多约 RPM × (1 + 系数) 次。渠道限流始终使用滑动窗口
+    RATE_LIMIT_BURST_RATIO: float = 0.0
+    # 空闲限流键的清理间隔（秒）
+    RATE_LIMIT_CLEANUP_INTERVAL: int = 60
+    # 限流存储：memory（进程内）/ sqlite（同一主机多 worker 共享）
+    RATE_LIMIT_BACKEND: str = "memory"
+    # sqlite 限流存储路径，留空则放在数据库目录下的 rate_limit.db
+    RATE_LIMIT_DB_PATH: str = ""
+
+    # 系统配置缓存的定时刷新间隔（秒），0 表示仅在后台修改时刷新
+    CONFIG_REFRESH_SECONDS: int = 0
+    # 多 worker 缓存同步：每隔该秒数检查渠道、IP 黑名单、公告、系统配置是否在其他 worker 中被修改，0 表示关闭（仅单 worker 适用）
+    CACHE_SYNC_INTERVAL_SECONDS: float = 2.0
+    # 模型列表与公告接口的浏览器缓存时间（秒），过期后凭 ETag 重新验证；0 表示每次都验证
+    PUBLIC_CACHE_MAX_AGE: int = 0
+
+    # 上游 HTTP 连接池配置
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    UPSTREAM_HTTP2: bool = False
+
+    # 渠道负载均衡策略：weighted（加权轮询）/ least_inflight（最少进行中请求）/ priority（按排序）
+    CHANNEL_ROUTING_STRATEGY: str = "weighted"
+
+    # 上游失败重试：首个字节发出前最多尝试的渠道数，以及指数退避的基础间隔（秒）
+    UPSTREAM_MAX_ATTEMPTS: int = 3
+    UPSTREAM_RETRY_BACKOFF: float = 0.2
+    # 请求上游在流末尾返回 usage（stream_options.include_usage），不支持该参数的上游请关闭
+    UPSTREAM_INCLUDE_USAGE: bool = False
+    # 流式转发合并窗口（毫秒）：窗口内到达的多个 SSE 帧合并为一次写出，0 表示逐块转发
+    SSE_COALESCE_MS: int = 10
 
     # 日志配置
     LOG_RETENTION_DAYS: int = 90
+    # 过期日志清理：执行间隔（秒，0 表示不清理）、每批删除条数
+    LOG_RETENTION_INTERVAL_SECONDS: int = 3600
+    LOG_RETENTION_BATCH_SIZE: int = 5000
+    # 冷日志归档：超过该天数的日志移出数据库，按月写入压缩归档文件（0 表示不归档）
+    LOG_ARCHIVE_AFTER_DAYS: int = 0
+    # 归档目录，留空则为数据库目录下的 archive
+    LOG_ARCHIVE_DIR: str = ""
+    # 归档执行间隔（秒），独立于过期日志清理运行；清理任务每次删除前也会先归档
+    LOG_ARCHIVE_INTERVAL_SECONDS: int = 3600
+    # 日志批量写入：每批最多条数、最长等待时间（毫秒）、队列容量（队列满时丢弃）
+    LOG_WRITER_BATCH_SIZE: int = 100
+    LOG_WRITER_FLUSH_MS: int = 500
+    LOG_WRITER_QUEUE_SIZE: int = 10000
+    # 批量写入失败（如 database is locked）时的重试次数与首次重试等待（毫秒，之后逐次翻倍）
+    LOG_WRITER_MAX_RETRIES: int = 3
+    LOG_WRITER_RETRY_BACKOFF_MS: int = 200
 
     # CORS 配置
     CORS_ORIGINS: str = "*"
@@ -1,3 +1,4 @@
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import settings
@@ -6,14 +7,46 @@ import os
 # 确保数据目录存在
 os.makedirs(os.path.dirname(settings.DATABASE_PATH), exist_ok=True)
 
-# 创建异步引擎
 DATABASE_URL = f"sqlite+aiosqlite:///{settings.DATABASE_PATH}"
+
+# 每个连接建立时应用的 PRAGMA
+SQLITE_PRAGMAS = {
+    "auto_vacuum": settings.SQLITE_AUTO_VACUUM,
+    "journal_mode": settings.SQLITE_JOURNAL_MODE,
+    "synchronous": settings.SQLITE_SYNCHRONOUS,
+    "busy_timeout": settings.SQLITE_BUSY_TIMEOUT,
+    "cache_size": settings.SQLITE_CACHE_SIZE,
+    "mmap_size": settings.SQLITE_MMAP_SIZE,
+    "temp_store": settings.SQLITE_TEMP_STORE,
+}
+
+
+def _pragma_listener(read_only: bool = False):
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            # 只读引擎：防止误写，并避免占用写锁
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return set_sqlite_pragmas
+
+
+# 创建异步引擎：写引擎用于业务读写，读引擎用于管理后台的重查询（日志、统计、导出）
 engine = create_async_engine(DATABASE_URL, echo=settings.DEBUG)
+read_engine = create_async_engine(DATABASE_URL, echo=settings.DEBUG)
+event.listen(engine.sync_engine, "connect", _pragma_listener())
+event.listen(read_engine.sync_engine, "connect", _pragma_listener(read_only=True))
 
 # 创建会话工厂
 AsyncSessionLocal = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
+AsyncReadSessionLocal = async_sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 # 创建基类
 Base = declarative_base()
@@ -28,11 +61,55 @@ async def get_db():
             await session.close()
 
 
+# 依赖注入：获取只读数据库会话
+async def get_read_db():
+    async with AsyncReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+# 新版本为已有表增加的列：create_all 不会修改已存在的表，启动时逐列补齐（均为可空列，无需回填）
+ADDED_COLUMNS = {
+    "channels": {
+        "weight": "INTEGER",
+    },
+    "chat_logs": {
+        "duration_ms": "INTEGER",
+        "ttft_ms": "INTEGER",
+        "upstream_status": "INTEGER",
+        "error_type": "VARCHAR(64)",
+    },
+}
+
+
+async def _add_missing_columns(conn):
+    for table, columns in ADDED_COLUMNS.items():
+        result = await conn.execute(text(f"PRAGMA table_info({table})"))
+        existing = {row[1] for row in result.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                print(f"为 {table} 表添加 {name} 字段")
+                await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"))
+
+
 # 初始化数据库
 async def init_db():
-    """初始化数据库，确保所有表都存在"""
+    """初始化数据库，确保所有表与新增的列都存在"""
     # 导入所有模型以确保它们被注册到 Base.metadata
-    from app.models import User, Channel, SystemConfig, BlockedIP, ChatLog, Announcement, Admin
+    from app.models import User, Channel, SystemConfig, BlockedIP, ChatLog, ChatLogDaily, Announcement, Admin, CacheVersion
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await _add_missing_columns(conn)
+
+
+async def get_effective_pragmas() -> dict:
+    """读取当前连接实际生效的 PRAGMA"""
+    pragmas = {}
+    async with engine.connect() as conn:
+        for name in SQLITE_PRAGMAS:
+            result = await conn.execute(text(f"PRAGMA {name}"))
+            pragmas[name] = result.scalar()
+    return pragmas
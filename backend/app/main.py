@@ -1,14 +1,13 @@
 from fastapi import FastAPI, Request, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy import select
 from app.config import settings
-from app.database import init_db, get_db
+from app.database import init_db, AsyncSessionLocal, get_effective_pragmas, engine, read_engine
 from app.routers import auth_router, chat_router, admin_router
-from app.models import BlockedIP
-from app.utils import is_ip_in_range
+from app.services import ip_blocklist, upstream_clients, rate_limiter, chat_log_writer, system_config, log_search, log_retention, log_archive, tokenizer_registry, channel_registry, announcement_cache, password_hasher, cache_sync
+from app.utils.fast_json import FastJSONResponse
+from app.services.static_site import StaticSite, StaticSiteMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import os
 
 
@@ -17,9 +16,43 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时初始化数据库
     await init_db()
+    await log_search.ensure(engine)
     print("数据库初始化完成")
+    pragmas = await get_effective_pragmas()
+    print("SQLite 参数: " + ", ".join(f"{name}={value}" for name, value in pragmas.items()))
+    # 加载 IP 黑名单索引、系统配置、渠道与公告，后台修改后通过版本号在各 worker 间同步
+    cache_sync.register("ip_blocklist", ip_blocklist.reload)
+    cache_sync.register("system_config", system_config.reload)
+    cache_sync.register("channels", channel_registry.reload)
+    cache_sync.register("announcement", announcement_cache.reload)
+    async with AsyncSessionLocal() as db:
+        await cache_sync.load(db)
+    print(f"IP 黑名单已加载: {len(ip_blocklist)} 条")
+    print(f"渠道已加载: {len(channel_registry)} 个")
+    system_config.start()
+    cache_sync.start()
+    # 预加载分词器词表（文件较大，在线程中加载）
+    await asyncio.to_thread(tokenizer_registry.preload)
+    # 启动限流器后台清理
+    rate_limiter.start()
+    # 启动日志批量写入
+    chat_log_writer.start()
+    # 启动过期日志定时清理
+    log_retention.start()
+    # 启动冷日志定时归档（与清理各自运行）
+    log_archive.start()
     yield
-    # 关闭时清理资源
+    # 关闭时清理资源（先写完剩余日志）
+    await log_archive.stop()
+    await log_retention.stop()
+    await chat_log_writer.stop()
+    await rate_limiter.stop()
+    await system_config.stop()
+    await cache_sync.stop()
+    await upstream_clients.aclose()
+    password_hasher.shutdown()
+    await engine.dispose()
+    await read_engine.dispose()
     print("应用关闭")
 
 
@@ -28,6 +61,7 @@ app = FastAPI(
     title=settings.APP_NAME,
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # CORS 配置
@@ -39,6 +73,7 @@ if settings.CORS_ORIGINS == "*":
         allow_credentials=False,  # 通配符时不能用 credentials
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 else:
     # 生产模式：指定源
@@ -49,6 +84,7 @@ else:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 
 
@@ -60,19 +96,13 @@ async def block_ip_middleware(request: Request, call_next):
     if request.url.path.startswith("/api/admin") or request.url.path.startswith("/docs"):
         return await call_next(request)
 
-    # 检查 IP 是否被禁用
+    # 检查 IP 是否被禁用（内存索引，无需查询数据库）
     ip_address = request.client.host
-    async for db in get_db():
-        result = await db.execute(select(BlockedIP))
-        blocked_ips = result.scalars().all()
-
-        for blocked in blocked_ips:
-            if is_ip_in_range(ip_address, blocked.ip_address):
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="您的 IP 已被禁止访问",
-                )
-        break
+    if ip_blocklist.is_blocked(ip_address):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="您的 IP 已被禁止访问",
+        )
 
     return await call_next(request)
 
@@ -92,16 +122,10 @@ if not os.path.exists(frontend_dist):
     frontend_dist = "/app/frontend/dist"
 
 if os.path.exists(frontend_dist):
-    app.mount("/assets", StaticFiles(directory=os.path.join(frontend_dist, "assets")), name="assets")
-
-    @app.get("/{full_path:path}")
-    async def serve_frontend(full_path: str):
-        """服务前端页面"""
-        file_path = os.path.join(frontend_dist, full_path)
-        if os.path.isfile(file_path):
-            return FileResponse(file_path)
-        # SPA 路由回退到 index.html
-        return FileResponse(os.path.join(frontend_dist, "index.html"))
+    # 最外层中间件：前端静态请求由内存清单直接响应
+    static_site = StaticSite(frontend_dist)
+    app.add_middleware(StaticSiteMiddleware, site=static_site)
+    print(f"前端静态文件已加载: {len(static_site)} 个")
 
 
 @app.get("/health")
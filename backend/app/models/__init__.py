@@ -3,7 +3,9 @@ from app.models.channel import Channel
 from app.models.config import SystemConfig
 from app.models.blocked_ip import BlockedIP
 from app.models.chat_log import ChatLog
+from app.models.chat_log_daily import ChatLogDaily
 from app.models.announcement import Announcement
 from app.models.admin import Admin
+from app.models.cache_version import CacheVersion
 
-__all__ = ["User", "Channel", "SystemConfig", "BlockedIP", "ChatLog", "Announcement", "Admin"]
+__all__ = ["User", "Channel", "SystemConfig", "BlockedIP", "ChatLog", "ChatLogDaily", "Announcement", "Admin", "CacheVersion"]
@@ -12,6 +12,7 @@ class Channel(Base):
     api_key = Column(Text, nullable=False)  # 明文存储
     model_id = Column(String(255), nullable=False)
     rpm_limit = Column(Integer, default=60)
+    weight = Column(Integer, nullable=True)  # 负载均衡权重，为空时按 rpm_limit 计算
     is_enabled = Column(Boolean, default=True)
     sort_order = Column(Integer, default=0, nullable=False)  # 排序字段，数值越小越靠前
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,17 +1,26 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
 
 class ChatLog(Base):
     __tablename__ = "chat_logs"
+    # 日志查询按 (created_at, id) 倒序分页，组合索引覆盖常用筛选；SQLite 索引隐含 rowid 即 id
+    __table_args__ = (
+        Index("ix_chat_logs_ip_created", "ip_address", "created_at"),
+        Index("ix_chat_logs_model_created", "model_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, index=True)  # 可为空（游客）
     username = Column(String(255))  # 用户邮箱或标识
-    ip_address = Column(String(255), nullable=False, index=True)
+    ip_address = Column(String(255), nullable=False)
     channel_id = Column(Integer)
     model_id = Column(String(255), nullable=False)
     prompt_tokens = Column(Integer)
     completion_tokens = Column(Integer)
+    duration_ms = Column(Integer)  # 上游调用总耗时
+    ttft_ms = Column(Integer)  # 首个内容帧耗时
+    upstream_status = Column(Integer)  # 上游 HTTP 状态码
+    error_type = Column(String(64))  # 为空表示成功
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, LargeBinary, UniqueConstraint
+from app.database import Base
+
+
+class ChatLogDaily(Base):
+    """按天、模型汇总的调用量，随日志写入增量维护"""
+    __tablename__ = "chat_log_daily"
+    __table_args__ = (UniqueConstraint("day", "model_id", name="uq_chat_log_daily_day_model"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    day = Column(String(10), nullable=False, index=True)  # UTC 日期 YYYY-MM-DD
+    model_id = Column(String(255), nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    user_sketch = Column(LargeBinary)  # 登录用户去重的 HyperLogLog 草图
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, extract
-from app.database import get_db
-from app.models import Channel, SystemConfig, BlockedIP, ChatLog, Announcement, Admin
+from sqlalchemy import select, tuple_, type_coerce, String
+from app.database import get_db, get_read_db, AsyncReadSessionLocal
+from app.models import Channel, SystemConfig, BlockedIP, ChatLog, ChatLogDaily, Announcement, Admin
 from app.schemas import (
     ChannelCreate,
     ChannelUpdate,
@@ -13,20 +13,27 @@ from app.schemas import (
     BlockedIPResponse,
     ChatLogResponse,
     StatsResponse,
+    LatencyStats,
     AnnouncementCreate,
     AnnouncementUpdate,
     AnnouncementResponse,
     AdminProfileResponse,
     AdminProfileUpdate,
 )
-from app.services import ChannelService, AuthService
-from app.utils import decode_access_token, is_ip_in_range, verify_password
+from app.services import ChannelService, AuthService, chat_log_writer, system_config, log_search, log_retention, log_archive, tokenizer_registry, password_hasher, cache_sync, LogAnalytics
+from app.utils import decode_access_token, encode_cursor, decode_cursor, parse_utc_datetime
+from app.utils.hll import HyperLogLog
+from app.utils import fast_json
+from app.utils.fast_json import FastJSONResponse, project
 from app.config import settings
 from typing import List, Optional
+from dataclasses import asdict
 from datetime import datetime, timedelta
 from fastapi.responses import StreamingResponse
 import csv
 import io
+import ipaddress
+import zlib
 
 router = APIRouter(prefix="/api/admin", tags=["管理员"])
 
@@ -58,7 +65,7 @@ async def get_channels(
 ):
     """获取渠道列表"""
     channels = await ChannelService.get_channels(db)
-    return channels
+    return FastJSONResponse(project(channels, ChannelResponse))
 
 
 @router.post("/channels", response_model=ChannelResponse)
@@ -69,6 +76,7 @@ async def create_channel(
 ):
     """创建渠道"""
     channel = await ChannelService.create_channel(db, channel_data)
+    await cache_sync.publish(db, "channels")
     return channel
 
 
@@ -98,6 +106,7 @@ async def reorder_channels(
             if channel:
                 channel.sort_order = sort_order
     await db.commit()
+    await cache_sync.publish(db, "channels")
     return {"message": "顺序更新成功"}
 
 
@@ -112,6 +121,7 @@ async def update_channel(
     channel = await ChannelService.update_channel(db, channel_id, channel_data)
     if not channel:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="渠道不存在")
+    await cache_sync.publish(db, "channels")
     return channel
 
 
@@ -125,25 +135,17 @@ async def delete_channel(
     success = await ChannelService.delete_channel(db, channel_id)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="渠道不存在")
+    await cache_sync.publish(db, "channels")
     return {"message": "删除成功"}
 
 
 # 系统配置
 @router.get("/config", response_model=SystemConfigResponse)
 async def get_config(
-    db: AsyncSession = Depends(get_db),
     _: dict = Depends(verify_admin),
 ):
     """获取系统配置"""
-    result = await db.execute(select(SystemConfig))
-    configs = {config.key: config.value for config in result.scalars().all()}
-
-    return SystemConfigResponse(
-        guest_rpm=int(configs.get("guest_rpm", settings.GUEST_RPM)),
-        user_rpm=int(configs.get("user_rpm", settings.USER_RPM)),
-        log_retention_days=int(configs.get("log_retention_days", settings.LOG_RETENTION_DAYS)),
-        allow_registration=configs.get("allow_registration", "true").lower() == "true",
-    )
+    return SystemConfigResponse(**asdict(system_config.snapshot))
 
 
 @router.put("/config", response_model=SystemConfigResponse)
@@ -166,7 +168,10 @@ async def update_config(
             db.add(config)
 
     await db.commit()
-    return await get_config(db, _)
+
+    # 重新加载配置快照并通知其他 worker
+    await cache_sync.publish(db, "system_config")
+    return SystemConfigResponse(**asdict(system_config.snapshot))
 
 
 # IP 管理
@@ -194,6 +199,7 @@ async def create_blocked_ip(
     db.add(blocked_ip)
     await db.commit()
     await db.refresh(blocked_ip)
+    await cache_sync.publish(db, "ip_blocklist")
     return blocked_ip
 
 
@@ -211,160 +217,276 @@ async def delete_blocked_ip(
 
     await db.delete(blocked_ip)
     await db.commit()
+    await cache_sync.publish(db, "ip_blocklist")
     return {"message": "删除成功"}
 
 
 # 日志查询
-@router.get("/logs", response_model=List[ChatLogResponse])
-async def get_logs(
+def _apply_log_filters(
+    query,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     username: Optional[str] = None,
     ip_address: Optional[str] = None,
     model_id: Optional[str] = None,
-    limit: int = 100,
-    offset: int = 0,
-    db: AsyncSession = Depends(get_db),
-    _: dict = Depends(verify_admin),
 ):
-    """获取日志列表"""
-    query = select(ChatLog).order_by(ChatLog.created_at.desc())
-
-    # 筛选条件
+    """日志列表与导出共用的筛选条件，用户名与 IP 支持子串搜索"""
     if start_date:
-        query = query.where(ChatLog.created_at >= datetime.fromisoformat(start_date))
+        query = query.where(ChatLog.created_at >= parse_utc_datetime(start_date))
     if end_date:
-        query = query.where(ChatLog.created_at <= datetime.fromisoformat(end_date))
+        query = query.where(ChatLog.created_at <= parse_utc_datetime(end_date))
     if username:
-        query = query.where(ChatLog.username.like(f"%{username}%"))
+        query = query.where(log_search.contains(ChatLog.username, username))
     if ip_address:
-        query = query.where(ChatLog.ip_address == ip_address)
+        # 完整 IP 精确匹配走普通索引，部分输入（如 "192.168."）按子串搜索
+        try:
+            ipaddress.ip_address(ip_address)
+            query = query.where(ChatLog.ip_address == ip_address)
+        except ValueError:
+            query = query.where(log_search.contains(ChatLog.ip_address, ip_address))
     if model_id:
         query = query.where(ChatLog.model_id == model_id)
+    return query
 
-    query = query.limit(limit).offset(offset)
-    result = await db.execute(query)
-    return result.scalars().all()
+
+def _log_filter_predicate(
+    username: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    model_id: Optional[str] = None,
+):
+    """与 _apply_log_filters 语义一致的内存筛选，用于归档日志（时间范围由归档读取处理）"""
+    if not (username or ip_address or model_id):
+        return None
+    username = username.lower() if username else None
+    try:
+        exact_ip = ip_address is not None and bool(ipaddress.ip_address(ip_address))
+    except ValueError:
+        exact_ip = False
+
+    def predicate(record: dict) -> bool:
+        if username and username not in (record.get("username") or "").lower():
+            return False
+        if ip_address:
+            value = record.get("ip_address") or ""
+            if (value != ip_address) if exact_ip else (ip_address not in value):
+                return False
+        if model_id and record.get("model_id") != model_id:
+            return False
+        return True
+
+    return predicate
+
+
+@router.get("/logs", response_model=List[ChatLogResponse])
+async def get_logs(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    username: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    model_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    _: dict = Depends(verify_admin),
+):
+    """
+    获取日志列表，按 (created_at, id) 倒序
+    传入上一页响应头 X-Next-Cursor 中的游标可按索引定位翻页，翻页代价与页码无关；
+    offset 仅为兼容保留
+    """
+    # created_at 按原始字符串读取与比较，与库中排序一致，避免 datetime 重新格式化后游标错位
+    raw_created_at = type_coerce(ChatLog.created_at, String)
+    query = (
+        select(*ChatLog.__table__.c, raw_created_at.label("cursor_created_at"))
+        .order_by(ChatLog.created_at.desc(), ChatLog.id.desc())
+    )
+    query = _apply_log_filters(query, start_date, end_date, username, ip_address, model_id)
+
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的分页游标")
+        query = query.where(tuple_(raw_created_at, ChatLog.id) < tuple_(cursor_created_at, cursor_id))
+    elif offset:
+        query = query.offset(offset)
+
+    # 多取一条判断是否还有下一页
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.mappings().all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last["cursor_created_at"], last["id"])
+    # 行结构由查询确定，直接序列化，跳过逐行的响应模型校验
+    return FastJSONResponse(project(rows, ChatLogResponse), headers=headers)
+
+
+# 导出列：(CSV 表头, 字段名)
+EXPORT_COLUMNS = [
+    ("ID", "id"),
+    ("用户ID", "user_id"),
+    ("用户名", "username"),
+    ("IP地址", "ip_address"),
+    ("渠道ID", "channel_id"),
+    ("模型ID", "model_id"),
+    ("提问Tokens", "prompt_tokens"),
+    ("回答Tokens", "completion_tokens"),
+    ("耗时(ms)", "duration_ms"),
+    ("首字耗时(ms)", "ttft_ms"),
+    ("上游状态码", "upstream_status"),
+    ("错误类型", "error_type"),
+    ("创建时间", "created_at"),
+]
+EXPORT_FIELDS = [field for _, field in EXPORT_COLUMNS]
+EXPORT_BATCH_SIZE = 2000
+
+
+async def _iter_log_export(query, fmt: str, compress: bool, archive_batches=None):
+    """
+    流式生成导出内容：服务端游标分批读取 Core 行，每批编码后立即输出
+    生成器自行打开只读会话，请求依赖的会话在响应开始前就已关闭；
+    archive_batches 为归档日志的异步批次迭代器，排在数据库日志之后输出
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def write_record(record: dict):
+        if record["created_at"]:
+            record["created_at"] = record["created_at"].isoformat()
+        if fmt == "csv":
+            writer.writerow(["" if record[field] is None else record[field] for field in EXPORT_FIELDS])
+        else:
+            buffer.write(fast_json.dumps(record).decode("utf-8"))
+            buffer.write("\n")
+
+    def flush() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    if fmt == "csv":
+        writer.writerow([header for header, _ in EXPORT_COLUMNS])
+
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            for row in partition:
+                write_record(dict(zip(EXPORT_FIELDS, row)))
+            chunk = flush()
+            if chunk:
+                yield chunk
+
+    if archive_batches is not None:
+        async for records in archive_batches:
+            for record in records:
+                write_record({field: record.get(field) for field in EXPORT_FIELDS})
+            chunk = flush()
+            if chunk:
+                yield chunk
+
+    tail = flush()
+    if compressor:
+        tail += compressor.flush()
+    if tail:
+        yield tail
 
 
 @router.get("/logs/export")
 async def export_logs(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: AsyncSession = Depends(get_db),
+    username: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    model_id: Optional[str] = None,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    compress: bool = False,
+    include_archive: bool = False,
     _: dict = Depends(verify_admin),
 ):
-    """导出日志（CSV）"""
-    query = select(ChatLog).order_by(ChatLog.created_at.desc())
+    """
+    导出日志（CSV 或 NDJSON，可选 gzip 压缩），逐批流式输出
+    include_archive 为 true 时在数据库日志之后追加归档中符合条件的历史日志
+    """
+    query = select(*(getattr(ChatLog, field) for field in EXPORT_FIELDS)).order_by(ChatLog.created_at.desc())
+    query = _apply_log_filters(query, start_date, end_date, username, ip_address, model_id)
+
+    archive_batches = None
+    if include_archive:
+        archive_batches = log_archive.iter_batches(
+            start=parse_utc_datetime(start_date) if start_date else None,
+            end=parse_utc_datetime(end_date) if end_date else None,
+            predicate=_log_filter_predicate(username, ip_address, model_id),
+        )
+
+    if format == "csv":
+        media_type, filename = "text/csv; charset=utf-8", "chat_logs.csv"
+    else:
+        media_type, filename = "application/x-ndjson", "chat_logs.ndjson"
+    if compress:
+        media_type, filename = "application/gzip", filename + ".gz"
 
-    if start_date:
-        query = query.where(ChatLog.created_at >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.where(ChatLog.created_at <= datetime.fromisoformat(end_date))
-
-    result = await db.execute(query)
-    logs = result.scalars().all()
-
-    # 生成 CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow([
-        "ID", "用户ID", "用户名", "IP地址", "渠道ID", "模型ID",
-        "提问Tokens", "回答Tokens", "创建时间"
-    ])
-
-    for log in logs:
-        writer.writerow([
-            log.id,
-            log.user_id or "",
-            log.username or "",
-            log.ip_address,
-            log.channel_id or "",
-            log.model_id,
-            log.prompt_tokens or 0,
-            log.completion_tokens or 0,
-            log.created_at.isoformat(),
-        ])
-
-    output.seek(0)
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=chat_logs.csv"},
+        _iter_log_export(query, format, compress, archive_batches),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
 
 # 统计数据
 @router.get("/stats", response_model=StatsResponse)
 async def get_stats(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _: dict = Depends(verify_admin),
 ):
-    """获取统计数据"""
+    """获取统计数据（读取按天汇总表）"""
     now = datetime.utcnow()
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = today_start - timedelta(days=7)
-    month_start = today_start - timedelta(days=30)
+    today = today_start.strftime("%Y-%m-%d")
+    week_start = (today_start - timedelta(days=7)).strftime("%Y-%m-%d")
+    month_start = (today_start - timedelta(days=30)).strftime("%Y-%m-%d")
 
-    # 今日/本周/本月调用量
-    today_result = await db.execute(
-        select(func.count(ChatLog.id)).where(ChatLog.created_at >= today_start)
-    )
-    today_calls = today_result.scalar() or 0
-
-    week_result = await db.execute(
-        select(func.count(ChatLog.id)).where(ChatLog.created_at >= week_start)
-    )
-    week_calls = week_result.scalar() or 0
+    result = await db.execute(select(ChatLogDaily).where(ChatLogDaily.day >= month_start))
+    rows = result.scalars().all()
 
-    month_result = await db.execute(
-        select(func.count(ChatLog.id)).where(ChatLog.created_at >= month_start)
-    )
-    month_calls = month_result.scalar() or 0
+    # 今日/本周/本月调用量
+    today_calls = sum(row.calls for row in rows if row.day == today)
+    week_calls = sum(row.calls for row in rows if row.day >= week_start)
+    month_calls = sum(row.calls for row in rows)
 
     # 模型使用占比
-    model_result = await db.execute(
-        select(ChatLog.model_id, func.count(ChatLog.id))
-        .where(ChatLog.created_at >= month_start)
-        .group_by(ChatLog.model_id)
-    )
-    model_distribution = {model: count for model, count in model_result.all()}
+    model_distribution = {}
+    for row in rows:
+        model_distribution[row.model_id] = model_distribution.get(row.model_id, 0) + row.calls
 
     # 调用趋势（最近7天）
+    daily_calls = {}
+    for row in rows:
+        daily_calls[row.day] = daily_calls.get(row.day, 0) + row.calls
     trend_data = []
-    for i in range(7):
-        day_start = today_start - timedelta(days=i)
-        day_end = day_start + timedelta(days=1)
-        day_result = await db.execute(
-            select(func.count(ChatLog.id)).where(
-                and_(ChatLog.created_at >= day_start, ChatLog.created_at < day_end)
-            )
-        )
-        count = day_result.scalar() or 0
-        trend_data.append({"date": day_start.strftime("%Y-%m-%d"), "count": count})
-
-    trend_data.reverse()
+    for i in range(6, -1, -1):
+        day = (today_start - timedelta(days=i)).strftime("%Y-%m-%d")
+        trend_data.append({"date": day, "count": daily_calls.get(day, 0)})
 
     # Token 消耗统计
-    token_result = await db.execute(
-        select(
-            func.sum(ChatLog.prompt_tokens),
-            func.sum(ChatLog.completion_tokens),
-        ).where(ChatLog.created_at >= month_start)
-    )
-    prompt_tokens, completion_tokens = token_result.one()
+    prompt_tokens = sum(row.prompt_tokens for row in rows)
+    completion_tokens = sum(row.completion_tokens for row in rows)
     token_stats = {
-        "prompt_tokens": prompt_tokens or 0,
-        "completion_tokens": completion_tokens or 0,
-        "total_tokens": (prompt_tokens or 0) + (completion_tokens or 0),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
     }
 
-    # 活跃用户数量
-    active_users_result = await db.execute(
-        select(func.count(func.distinct(ChatLog.user_id)))
-        .where(and_(ChatLog.created_at >= month_start, ChatLog.user_id.isnot(None)))
-    )
-    active_users = active_users_result.scalar() or 0
+    # 活跃用户数量（合并每日去重草图）
+    sketch = HyperLogLog()
+    for row in rows:
+        if row.user_sketch:
+            sketch.merge(HyperLogLog.from_bytes(row.user_sketch))
+    active_users = sketch.count()
 
     return StatsResponse(
         today_calls=today_calls,
@@ -377,6 +499,57 @@ async def get_stats(
     )
 
 
+# 延迟分析
+@router.get("/analytics/latency", response_model=List[LatencyStats])
+async def get_latency_analytics(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    granularity: str = Query("hour", pattern="^(minute|hour|day)$"),
+    channel_id: Optional[int] = None,
+    model_id: Optional[str] = None,
+    include_archive: bool = False,
+    db: AsyncSession = Depends(get_read_db),
+    _: dict = Depends(verify_admin),
+):
+    """按时间粒度、渠道、模型统计耗时与首字耗时百分位（默认最近24小时，可包含归档日志）"""
+    end = parse_utc_datetime(end_date) if end_date else datetime.utcnow()
+    start = parse_utc_datetime(start_date) if start_date else end - timedelta(hours=24)
+    return await LogAnalytics.latency_percentiles(
+        db,
+        start,
+        end,
+        granularity=granularity,
+        channel_id=channel_id,
+        model_id=model_id,
+        include_archive=include_archive,
+    )
+
+
+# 运行指标
+@router.get("/metrics")
+async def get_metrics(
+    _: dict = Depends(verify_admin),
+):
+    """获取运行指标"""
+    return {
+        "log_writer": chat_log_writer.metrics(),
+        "log_retention": log_retention.metrics(),
+        "log_archive": log_archive.metrics(),
+        "tokenizer": tokenizer_registry.metrics(),
+        "password_hasher": password_hasher.metrics(),
+        "cache_sync": cache_sync.metrics(),
+    }
+
+
+@router.post("/logs/purge")
+async def purge_logs(
+    _: dict = Depends(verify_admin),
+):
+    """立即按保留天数清理过期日志"""
+    purged = await log_retention.run_once()
+    return {"message": f"已清理 {purged} 条过期日志", "purged": purged}
+
+
 # ==================== 公告管理 ====================
 
 
@@ -402,6 +575,7 @@ async def create_announcement(
     db.add(announcement)
     await db.commit()
     await db.refresh(announcement)
+    await cache_sync.publish(db, "announcement")
     return announcement
 
 
@@ -424,6 +598,7 @@ async def update_announcement(
 
     await db.commit()
     await db.refresh(announcement)
+    await cache_sync.publish(db, "announcement")
     return announcement
 
 
@@ -441,6 +616,7 @@ async def delete_announcement(
 
     await db.delete(announcement)
     await db.commit()
+    await cache_sync.publish(db, "announcement")
     return {"message": "删除成功"}
 
 
@@ -479,7 +655,7 @@ async def update_admin_profile(
         # 验证当前密码
         if db_admin:
             # 数据库中有记录，验证数据库密码
-            if not verify_password(profile_data.current_password, db_admin.password_hash):
+            if not await password_hasher.verify(profile_data.current_password, db_admin.password_hash):
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="当前密码错误"
@@ -1,10 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from app.database import get_db
 from app.schemas import UserCreate, UserLogin, Token, AdminLogin
-from app.services import AuthService
-from app.models import SystemConfig
+from app.services import AuthService, system_config
 
 router = APIRouter(prefix="/api/auth", tags=["认证"])
 
@@ -13,11 +11,7 @@ router = APIRouter(prefix="/api/auth", tags=["认证"])
 async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """用户注册"""
     # 检查是否允许注册
-    result = await db.execute(select(SystemConfig).where(SystemConfig.key == "allow_registration"))
-    config = result.scalar_one_or_none()
-    allow_registration = config.value.lower() == "true" if config else True
-
-    if not allow_registration:
+    if not system_config.snapshot.allow_registration:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="当前系统不允许新用户注册"
@@ -44,7 +38,8 @@ async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="邮箱或密码错误",
         )
-    token = AuthService.create_token(str(user.id), "user")
+    # 邮箱写入 Token，聊天请求无需再查询数据库
+    token = AuthService.create_token(str(user.id), "user", email=user.email)
     return Token(access_token=token)
 
 
@@ -1,13 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from app.database import get_db
 from app.schemas import ChatCompletionRequest, ModelInfo, AnnouncementResponse
-from app.services import ChatService, rate_limiter
+from app.services import AuthService, ChatService, rate_limiter, system_config, channel_registry, announcement_cache
 from app.utils import decode_access_token
+from app.utils.http_cache import cached_json_response
 from app.config import settings
-from app.models import Announcement
 from typing import Optional, List
 import json
 
@@ -27,11 +26,10 @@ async def get_current_user(request: Request, db: AsyncSession) -> tuple[Optional
 
     user_id = int(payload.get("sub"))
 
-    # 从数据库查询用户邮箱
-    from app.models import User
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-    username = user.email if user else None
+    # 优先使用 Token 中携带的邮箱，旧 Token 再查询（带缓存）
+    username = payload.get("email")
+    if username is None:
+        username = await AuthService.get_user_email(db, user_id)
 
     return user_id, username
 
@@ -63,23 +61,21 @@ async def get_real_ip(request: Request) -> str:
     return request.client.host
 
 
-async def check_user_rate_limit(request: Request, user_id: Optional[int], db: AsyncSession) -> bool:
+async def check_user_rate_limit(request: Request, user_id: Optional[int]) -> bool:
     """检查用户限流"""
     ip_address = await get_real_ip(request)
 
-    # 从数据库读取限流配置
-    from app.models import SystemConfig
-    result = await db.execute(select(SystemConfig))
-    configs = {config.key: config.value for config in result.scalars().all()}
+    # 限流配置读取内存快照
+    config = system_config.snapshot
 
     if user_id:
         # 已登录用户
         key = f"user:{user_id}"
-        limit = int(configs.get("user_rpm", settings.USER_RPM))
+        limit = config.user_rpm
     else:
         # 游客
         key = f"ip:{ip_address}"
-        limit = int(configs.get("guest_rpm", settings.GUEST_RPM))
+        limit = config.guest_rpm
 
     allowed, retry_after = await rate_limiter.check_rate_limit(key, limit)
     if not allowed:
@@ -98,22 +94,15 @@ async def check_user_rate_limit(request: Request, user_id: Optional[int], db: As
 
 
 @router.get("/models", response_model=list[ModelInfo])
-async def get_models(db: AsyncSession = Depends(get_db)):
-    """获取可用模型列表"""
-    return await ChatService.get_available_models(db)
+async def get_models(request: Request):
+    """获取可用模型列表（内存中的预序列化响应，支持 ETag 协商缓存）"""
+    return cached_json_response(request, channel_registry.models_response, settings.PUBLIC_CACHE_MAX_AGE)
 
 
 @router.get("/announcement", response_model=Optional[AnnouncementResponse])
-async def get_announcement(db: AsyncSession = Depends(get_db)):
-    """获取启用的公告"""
-    result = await db.execute(
-        select(Announcement)
-        .where(Announcement.is_enabled == True)
-        .order_by(Announcement.created_at.desc())
-        .limit(1)
-    )
-    announcement = result.scalar_one_or_none()
-    return announcement
+async def get_announcement(request: Request):
+    """获取启用的公告（内存中的预序列化响应，支持 ETag 协商缓存）"""
+    return cached_json_response(request, announcement_cache.cached, settings.PUBLIC_CACHE_MAX_AGE)
 
 
 @router.post("/completions")
@@ -127,7 +116,7 @@ async def chat_completions(
     user_id, username = await get_current_user(request, db)
 
     # 检查用户限流
-    await check_user_rate_limit(request, user_id, db)
+    await check_user_rate_limit(request, user_id)
 
     # 获取真实 IP 地址
     ip_address = await get_real_ip(request)
@@ -135,7 +124,7 @@ async def chat_completions(
     # 流式响应
     return StreamingResponse(
         ChatService.stream_chat_completion(
-            db, chat_request, user_id, username, ip_address
+            chat_request, user_id, username, ip_address
         ),
         media_type="text/event-stream",
     )
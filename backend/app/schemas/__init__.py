@@ -13,6 +13,7 @@ from app.schemas.admin import (
     BlockedIPResponse,
     ChatLogResponse,
     StatsResponse,
+    LatencyStats,
     AdminProfileResponse,
     AdminProfileUpdate,
 )
@@ -41,6 +42,7 @@ __all__ = [
     "BlockedIPResponse",
     "ChatLogResponse",
     "StatsResponse",
+    "LatencyStats",
     "AdminProfileResponse",
     "AdminProfileUpdate",
     "AnnouncementCreate",
@@ -41,6 +41,10 @@ class ChatLogResponse(BaseModel):
     model_id: str
     prompt_tokens: Optional[int]
     completion_tokens: Optional[int]
+    duration_ms: Optional[int] = None
+    ttft_ms: Optional[int] = None
+    upstream_status: Optional[int] = None
+    error_type: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -57,6 +61,20 @@ class StatsResponse(BaseModel):
     active_users: int
 
 
+class LatencyStats(BaseModel):
+    bucket: str
+    channel_id: Optional[int]
+    model_id: str
+    requests: int
+    errors: int
+    latency_p50: Optional[int]
+    latency_p90: Optional[int]
+    latency_p99: Optional[int]
+    ttft_p50: Optional[int]
+    ttft_p90: Optional[int]
+    ttft_p99: Optional[int]
+
+
 class AdminProfileResponse(BaseModel):
     username: str
 
@@ -9,6 +9,7 @@ class ChannelBase(BaseModel):
     api_key: str = Field(..., min_length=1)
     model_id: str = Field(..., min_length=1, max_length=255)
     rpm_limit: int = Field(default=60, ge=1)
+    weight: Optional[int] = Field(default=None, ge=1)
     is_enabled: bool = True
     sort_order: int = Field(default=0)
 
@@ -23,6 +24,7 @@ class ChannelUpdate(BaseModel):
     api_key: Optional[str] = Field(None, min_length=1)
     model_id: Optional[str] = Field(None, min_length=1, max_length=255)
     rpm_limit: Optional[int] = Field(None, ge=1)
+    weight: Optional[int] = Field(None, ge=1)
     is_enabled: Optional[bool] = None
     sort_order: Optional[int] = None
 
@@ -34,6 +36,7 @@ class ChannelResponse(BaseModel):
     api_key: str
     model_id: str
     rpm_limit: int
+    weight: Optional[int] = None
     is_enabled: bool
     sort_order: int
     created_at: datetime
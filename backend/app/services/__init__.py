@@ -1,6 +1,19 @@
+from app.services.password_hasher import password_hasher
 from app.services.auth import AuthService
 from app.services.channel import ChannelService
 from app.services.chat import ChatService
 from app.services.rate_limit import rate_limiter
+from app.services.ip_blocklist import ip_blocklist
+from app.services.http_client import upstream_clients
+from app.services.log_writer import chat_log_writer
+from app.services.system_config import system_config
+from app.services.log_analytics import LogAnalytics
+from app.services.log_search import log_search
+from app.services.log_retention import log_retention
+from app.services.log_archive import log_archive
+from app.services.tokenizer import tokenizer_registry
+from app.services.channel_registry import channel_registry
+from app.services.announcement_cache import announcement_cache
+from app.services.cache_sync import cache_sync
 
-__all__ = ["AuthService", "ChannelService", "ChatService", "rate_limiter"]
+__all__ = ["AuthService", "ChannelService", "ChatService", "rate_limiter", "ip_blocklist", "upstream_clients", "chat_log_writer", "system_config", "LogAnalytics", "log_search", "log_retention", "log_archive", "tokenizer_registry", "channel_registry", "announcement_cache", "password_hasher", "cache_sync"]
@@ -0,0 +1,41 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.models import Announcement
+from app.schemas import AnnouncementResponse
+from app.utils.http_cache import CachedJSON
+
+
+class AnnouncementCache:
+    """
+    当前公告缓存：启动时加载，公告增删改后整体替换
+
+    保存最新一条启用公告预先序列化的响应体与 ETag，前台公告接口不再查询数据库。
+    """
+
+    def __init__(self):
+        self._cached = CachedJSON.build(None)
+
+    @property
+    def cached(self) -> CachedJSON:
+        return self._cached
+
+    async def reload(self, db: AsyncSession) -> CachedJSON:
+        """从数据库重新加载当前公告"""
+        result = await db.execute(
+            select(Announcement)
+            .where(Announcement.is_enabled == True)
+            .order_by(Announcement.created_at.desc())
+            .limit(1)
+        )
+        announcement = result.scalar_one_or_none()
+        content = (
+            AnnouncementResponse.model_validate(announcement).model_dump(mode="json")
+            if announcement else None
+        )
+        # 单次赋值替换
+        self._cached = CachedJSON.build(content)
+        return self._cached
+
+
+# 全局公告缓存
+announcement_cache = AnnouncementCache()
@@ -2,10 +2,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models import User, Admin
 from app.schemas import UserCreate
-from app.utils import get_password_hash, verify_password, create_access_token
+from app.services.password_hasher import password_hasher
+from app.utils import create_access_token, LRUCache
 from app.config import settings
 from typing import Optional
 
+# 用户邮箱缓存：{user_id: email}（用户注册后邮箱不可修改、用户不可删除，缓存无需失效；
+# 若日后增加修改邮箱或删除用户的接口，需在其中清除对应的缓存项）
+_user_email_cache = LRUCache(settings.USER_CACHE_SIZE)
+
 
 class AuthService:
     @staticmethod
@@ -18,7 +23,7 @@ class AuthService:
             raise ValueError("邮箱已被注册")
 
         # 创建用户
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         user = User(email=user_data.email, password_hash=hashed_password)
         db.add(user)
         await db.commit()
@@ -32,8 +37,12 @@ class AuthService:
         user = result.scalar_one_or_none()
         if not user:
             return None
-        if not verify_password(password, user.password_hash):
+        if not await password_hasher.verify(password, user.password_hash):
             return None
+        if password_hasher.needs_rehash(user.password_hash):
+            # 哈希参数已变更，登录成功时用当前参数重新哈希
+            user.password_hash = await password_hasher.hash(password)
+            await db.commit()
         return user
 
     @staticmethod
@@ -45,7 +54,12 @@ class AuthService:
 
         if admin:
             # 数据库中存在管理员记录，使用数据库验证
-            return verify_password(password, admin.password_hash)
+            if not await password_hasher.verify(password, admin.password_hash):
+                return False
+            if password_hasher.needs_rehash(admin.password_hash):
+                admin.password_hash = await password_hasher.hash(password)
+                await db.commit()
+            return True
         else:
             # 数据库中不存在，使用配置文件验证
             return (
@@ -59,7 +73,7 @@ class AuthService:
         result = await db.execute(select(Admin).where(Admin.username == username))
         admin = result.scalar_one_or_none()
 
-        hashed_password = get_password_hash(new_password)
+        hashed_password = await password_hasher.hash(new_password)
 
         if admin:
             # 更新现有管理员密码
@@ -74,6 +88,19 @@ class AuthService:
         return admin
 
     @staticmethod
-    def create_token(subject: str, token_type: str = "user") -> str:
-        """创建访问令牌"""
-        return create_access_token({"sub": subject, "type": token_type})
+    async def get_user_email(db: AsyncSession, user_id: int) -> Optional[str]:
+        """获取用户邮箱（带缓存）"""
+        email = _user_email_cache.get(user_id)
+        if email is not None:
+            return email
+
+        result = await db.execute(select(User.email).where(User.id == user_id))
+        email = result.scalar_one_or_none()
+        if email is not None:
+            _user_email_cache.set(user_id, email)
+        return email
+
+    @staticmethod
+    def create_token(subject: str, token_type: str = "user", **claims) -> str:
+        """创建访问令牌，额外的 claims 会一并写入 Token"""
+        return create_access_token({"sub": subject, "type": token_type, **claims})
@@ -0,0 +1,109 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from app.database import AsyncSessionLocal
+from app.models import CacheVersion
+from app.config import settings
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+
+Reloader = Callable[[AsyncSession], Awaitable]
+
+
+class CacheSync:
+    """
+    多 worker 间的进程内缓存同步
+
+    渠道、IP 黑名单、公告、系统配置等缓存各自登记一个名称与重新加载函数。后台修改后调用
+    publish：在 cache_versions 表中递增该缓存的版本号并重新加载本进程的缓存；
+    其他 worker 每隔 interval 秒读取一次版本表（一条很小的查询），版本变化时重新加载对应缓存。
+    """
+
+    def __init__(self, interval: float = 2.0):
+        self._interval = interval
+        self._reloaders: Dict[str, Reloader] = {}
+        # 本进程已加载的版本号
+        self._versions: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        # 统计指标
+        self._reloads = 0
+        self._last_reload: Optional[datetime] = None
+        self._last_error: Optional[str] = None
+
+    def register(self, name: str, reloader: Reloader):
+        """登记缓存及其重新加载函数"""
+        self._reloaders[name] = reloader
+
+    async def _read_versions(self, db: AsyncSession) -> Dict[str, int]:
+        result = await db.execute(select(CacheVersion.name, CacheVersion.version))
+        return {name: version for name, version in result.all()}
+
+    async def load(self, db: AsyncSession):
+        """启动时加载全部缓存（先读版本号，期间发生的修改会在下次检查时补上）"""
+        versions = await self._read_versions(db)
+        for name, reloader in self._reloaders.items():
+            await reloader(db)
+            self._versions[name] = versions.get(name, 0)
+
+    async def publish(self, db: AsyncSession, name: str):
+        """数据已提交后调用：递增版本号通知其他 worker，并重新加载本进程的缓存"""
+        result = await db.execute(
+            insert(CacheVersion)
+            .values(name=name, version=1)
+            .on_conflict_do_update(index_elements=[CacheVersion.name], set_={"version": CacheVersion.version + 1})
+            .returning(CacheVersion.version)
+        )
+        version = result.scalar_one()
+        await db.commit()
+        await self._reloaders[name](db)
+        self._versions[name] = version
+
+    async def check(self):
+        """读取版本表，重新加载版本发生变化的缓存"""
+        async with AsyncSessionLocal() as db:
+            versions = await self._read_versions(db)
+            for name, reloader in self._reloaders.items():
+                version = versions.get(name, 0)
+                if version != self._versions.get(name):
+                    await reloader(db)
+                    self._versions[name] = version
+                    self._reloads += 1
+                    self._last_reload = datetime.utcnow()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.check()
+                self._last_error = None
+            except Exception as e:
+                self._last_error = f"{type(e).__name__}: {e}"
+                print(f"缓存同步失败: {self._last_error}")
+
+    def start(self):
+        """启动定时检查（interval 为 0 时不启动，仅单 worker 部署适用）"""
+        if self._interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "interval": self._interval,
+            "versions": dict(self._versions),
+            "reloads": self._reloads,
+            "last_reload": self._last_reload.isoformat() if self._last_reload else None,
+            "last_error": self._last_error,
+        }
+
+
+# 全局缓存同步
+cache_sync = CacheSync(interval=settings.CACHE_SYNC_INTERVAL_SECONDS)
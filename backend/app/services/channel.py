@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models import Channel
 from app.schemas import ChannelCreate, ChannelUpdate
+from app.services.http_client import upstream_clients
 from typing import List, Optional, Dict
 import httpx
 import asyncio
@@ -32,6 +33,7 @@ class ChannelService:
             api_key=channel_data.api_key,
             model_id=channel_data.model_id,
             rpm_limit=channel_data.rpm_limit,
+            weight=channel_data.weight,
             is_enabled=channel_data.is_enabled,
         )
         db.add(channel)
@@ -56,6 +58,7 @@ class ChannelService:
 
         await db.commit()
         await db.refresh(channel)
+        # 旧地址的连接池在渠道注册表重新加载时释放
         return channel
 
     @staticmethod
@@ -74,39 +77,44 @@ class ChannelService:
     async def test_channel(channel_data: ChannelCreate) -> Dict[str, any]:
         """测试渠道连接"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                # 构建测试请求
-                headers = {
-                    "Authorization": f"Bearer {channel_data.api_key}",
-                    "Content-Type": "application/json",
-                }
+            # 构建测试请求
+            headers = {
+                "Authorization": f"Bearer {channel_data.api_key}",
+                "Content-Type": "application/json",
+            }
 
-                # 发送一个简单的测试请求
-                payload = {
-                    "model": channel_data.model_id,
-                    "messages": [{"role": "user", "content": "test"}],
-                    "max_tokens": 5,
-                }
+            # 发送一个简单的测试请求
+            payload = {
+                "model": channel_data.model_id,
+                "messages": [{"role": "user", "content": "test"}],
+                "max_tokens": 5,
+            }
 
-                # 确保base_url正确拼接
-                base_url = channel_data.base_url.rstrip("/")
-                if not base_url.endswith("/chat/completions"):
-                    if base_url.endswith("/v1"):
-                        url = base_url + "/chat/completions"
-                    else:
-                        url = base_url + "/v1/chat/completions"
+            # 确保base_url正确拼接
+            base_url = channel_data.base_url.rstrip("/")
+            if not base_url.endswith("/chat/completions"):
+                if base_url.endswith("/v1"):
+                    url = base_url + "/chat/completions"
                 else:
-                    url = base_url
+                    url = base_url + "/v1/chat/completions"
+            else:
+                url = base_url
 
-                response = await client.post(url, json=payload, headers=headers)
+            # 已保存的渠道地址复用共享连接池，未保存的地址使用临时客户端，避免留下无人使用的连接池
+            if upstream_clients.peek(channel_data.base_url) is not None:
+                with upstream_clients.lease(channel_data.base_url) as client:
+                    response = await client.post(url, json=payload, headers=headers, timeout=10.0)
+            else:
+                async with httpx.AsyncClient(timeout=10.0) as client:
+                    response = await client.post(url, json=payload, headers=headers)
 
-                if response.status_code == 200:
-                    return {"success": True, "message": "连接成功"}
-                else:
-                    return {
-                        "success": False,
-                        "message": f"连接失败: HTTP {response.status_code} - {response.text[:200]}",
-                    }
+            if response.status_code == 200:
+                return {"success": True, "message": "连接成功"}
+            else:
+                return {
+                    "success": False,
+                    "message": f"连接失败: HTTP {response.status_code} - {response.text[:200]}",
+                }
         except httpx.TimeoutException:
             return {"success": False, "message": "连接超时"}
         except Exception as e:
@@ -0,0 +1,95 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.models import Channel
+from app.services.http_client import upstream_clients
+from app.services.channel_router import channel_router
+from app.utils.http_cache import CachedJSON
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ChannelSnapshot:
+    """渠道快照（不可变），字段与路由和转发所需一致"""
+
+    id: int
+    name: str
+    base_url: str
+    api_key: str
+    model_id: str
+    rpm_limit: Optional[int]
+    weight: Optional[int]
+    sort_order: int
+
+    @classmethod
+    def from_model(cls, channel: Channel) -> "ChannelSnapshot":
+        return cls(
+            id=channel.id,
+            name=channel.name,
+            base_url=channel.base_url,
+            api_key=channel.api_key,
+            model_id=channel.model_id,
+            rpm_limit=channel.rpm_limit,
+            weight=channel.weight,
+            sort_order=channel.sort_order or 0,
+        )
+
+
+@dataclass(frozen=True)
+class _RegistryState:
+    by_model: Dict[str, Tuple[ChannelSnapshot, ...]]
+    # 模型列表预先序列化的响应体与 ETag
+    models_response: CachedJSON
+
+
+class ChannelRegistry:
+    """
+    进程内渠道注册表：启动时加载已启用的渠道，按 model_id 索引
+
+    聊天路由与模型列表只读内存，不再每次请求查询数据库；渠道增删改与排序后
+    通过 cache_sync 在各 worker 中调用 reload 整体替换，读取方拿到的始终是同一版本的完整数据。
+    """
+
+    def __init__(self):
+        self._state = _RegistryState(by_model={}, models_response=CachedJSON.build([]))
+
+    async def reload(self, db: AsyncSession):
+        """从数据库重新加载已启用的渠道"""
+        result = await db.execute(
+            select(Channel)
+            .where(Channel.is_enabled == True)
+            .order_by(Channel.sort_order, Channel.id)
+        )
+        by_model: Dict[str, List[ChannelSnapshot]] = {}
+        models = []
+        for channel in result.scalars().all():
+            if channel.model_id not in by_model:
+                by_model[channel.model_id] = []
+                models.append({"id": channel.model_id, "name": channel.name})
+            by_model[channel.model_id].append(ChannelSnapshot.from_model(channel))
+        # 单次赋值替换
+        self._state = _RegistryState(
+            by_model={model_id: tuple(channels) for model_id, channels in by_model.items()},
+            models_response=CachedJSON.build(models),
+        )
+        # 释放已删除、停用或改了地址的渠道留下的连接池与路由状态（各 worker 在同步时各自释放）
+        upstream_clients.retain(
+            channel.base_url for channels in by_model.values() for channel in channels
+        )
+        channel_router.retain(channel.id for channels in by_model.values() for channel in channels)
+
+    def channels_for(self, model_id: str) -> Tuple[ChannelSnapshot, ...]:
+        """获取指定模型的可用渠道（按排序）"""
+        return self._state.by_model.get(model_id, ())
+
+    @property
+    def models_response(self) -> CachedJSON:
+        """可用模型列表（每个模型取排序最前的渠道名称）的预序列化响应"""
+        return self._state.models_response
+
+    def __len__(self) -> int:
+        return sum(len(channels) for channels in self._state.by_model.values())
+
+
+# 全局渠道注册表
+channel_registry = ChannelRegistry()
@@ -0,0 +1,131 @@
+from app.services.rate_limit import rate_limiter
+from app.config import settings
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+import time
+
+if TYPE_CHECKING:
+    # channel_registry 在重新加载时调用本模块，类型注解避免循环导入
+    from app.services.channel_registry import ChannelSnapshot
+
+
+class ChannelRouter:
+    """同一模型多渠道之间的负载均衡"""
+
+    STRATEGIES = ("weighted", "least_inflight", "priority")
+    # 失败冷却时间（秒）
+    COOLDOWN_BASE = 1.0
+    COOLDOWN_MAX = 30.0
+
+    def __init__(self, strategy: str = "weighted"):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"未知的渠道路由策略: {strategy}")
+        self.strategy = strategy
+        # 平滑加权轮询的当前权重：{channel_id: current_weight}
+        self._current: Dict[int, int] = {}
+        # 进行中的请求数：{channel_id: count}
+        self._inflight: Dict[int, int] = {}
+        # 上游失败记录：{channel_id: (连续失败次数, 冷却截止时间)}
+        self._failures: Dict[int, Tuple[int, float]] = {}
+
+    @staticmethod
+    def weight_of(channel: "ChannelSnapshot") -> int:
+        """渠道权重，未设置时按 RPM 上限折算"""
+        return max(channel.weight or channel.rpm_limit or 1, 1)
+
+    def inflight(self, channel_id: int) -> int:
+        return self._inflight.get(channel_id, 0)
+
+    def is_cooling(self, channel_id: int) -> bool:
+        """渠道是否处于失败后的冷却期"""
+        failure = self._failures.get(channel_id)
+        return failure is not None and failure[1] > time.monotonic()
+
+    def report_failure(self, channel_id: int):
+        """记录一次上游失败（429 / 5xx / 连接失败），连续失败时冷却时间指数增长"""
+        count = self._failures.get(channel_id, (0, 0.0))[0] + 1
+        cooldown = min(self.COOLDOWN_BASE * (2 ** (count - 1)), self.COOLDOWN_MAX)
+        self._failures[channel_id] = (count, time.monotonic() + cooldown)
+
+    def report_success(self, channel_id: int):
+        """记录一次成功请求，清除失败状态"""
+        self._failures.pop(channel_id, None)
+
+    def retain(self, channel_ids: Iterable[int]):
+        """渠道注册表重新加载后调用：清除已删除、停用渠道的轮询权重与失败记录，重新启用时从零开始"""
+        keep = set(channel_ids)
+        self._current = {cid: weight for cid, weight in self._current.items() if cid in keep}
+        self._failures = {cid: failure for cid, failure in self._failures.items() if cid in keep}
+
+    def order(self, channels: Iterable["ChannelSnapshot"], exclude: Iterable[int] = ()) -> List["ChannelSnapshot"]:
+        """
+        按当前策略给出候选渠道（不含 exclude）的尝试顺序，冷却中的渠道排在最后
+        加权轮询只在参与选择的渠道间推进：已尝试过的渠道不参与，冷却中的渠道只在全部冷却时参与
+        """
+        excluded = set(exclude)
+        candidates = [c for c in channels if c.id not in excluded]
+        if not self._failures:
+            return self._order(candidates)
+        healthy = [c for c in candidates if not self.is_cooling(c.id)]
+        if not healthy:
+            return self._order(candidates)
+        cooling = sorted((c for c in candidates if self.is_cooling(c.id)), key=lambda c: (c.sort_order, c.id))
+        return self._order(healthy) + cooling
+
+    def _order(self, channels: Iterable["ChannelSnapshot"]) -> List["ChannelSnapshot"]:
+        channels = sorted(channels, key=lambda c: (c.sort_order, c.id))
+        if len(channels) <= 1 or self.strategy == "priority":
+            return channels
+
+        if self.strategy == "least_inflight":
+            # 稳定排序，负载相同时保持 sort_order 顺序
+            return sorted(channels, key=lambda c: self.inflight(c.id) / self.weight_of(c))
+
+        # 平滑加权轮询（nginx smooth weighted round-robin）选出首选渠道，其余按 sort_order 兜底
+        total = 0
+        best = None
+        for channel in channels:
+            weight = self.weight_of(channel)
+            self._current[channel.id] = self._current.get(channel.id, 0) + weight
+            total += weight
+            if best is None or self._current[channel.id] > self._current[best.id]:
+                best = channel
+        self._current[best.id] -= total
+        return [best] + [c for c in channels if c is not best]
+
+    async def acquire(
+        self, channels: Iterable["ChannelSnapshot"], exclude: Iterable[int] = ()
+    ) -> Tuple[Optional["ChannelSnapshot"], bool]:
+        """
+        选择一个可用渠道
+        :param channels: 该模型的所有启用渠道
+        :param exclude: 需要跳过的渠道 ID
+        :return: (选中的渠道, 是否因渠道限流而无可用渠道)
+        """
+        saturated = False
+        for channel in self.order(channels, exclude):
+            # 渠道级限流：已达 RPM 上限的渠道直接跳过（滑动窗口，不超过上游 RPM 配额）
+            allowed, _ = await rate_limiter.check_rate_limit(
+                f"channel:{channel.id}", channel.rpm_limit, strict=True
+            )
+            if allowed:
+                return channel, False
+            saturated = True
+        return None, saturated
+
+    @contextmanager
+    def track(self, channel_id: int):
+        """统计渠道进行中的请求数"""
+        self._inflight[channel_id] = self._inflight.get(channel_id, 0) + 1
+        try:
+            yield
+        finally:
+            remaining = self._inflight.get(channel_id, 1) - 1
+            if remaining > 0:
+                self._inflight[channel_id] = remaining
+            else:
+                self._inflight.pop(channel_id, None)
+
+
+# 全局渠道路由实例
+channel_router = ChannelRouter(settings.CHANNEL_ROUTING_STRATEGY)
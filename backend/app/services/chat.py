@@ -1,136 +1,168 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.models import Channel, ChatLog
 from app.schemas import ChatCompletionRequest
-from app.services.channel import ChannelService
-from app.services.rate_limit import rate_limiter
-from app.utils import estimate_tokens
-from typing import Optional, AsyncGenerator
+from app.services.channel_registry import ChannelSnapshot, channel_registry
+from app.services.http_client import upstream_clients
+from app.services.channel_router import channel_router
+from app.services.log_writer import chat_log_writer
+from app.services.token_accounting import StreamUsage
+from app.services.tokenizer import tokenizer_registry
+from app.services.sse_relay import SSEScanner, relay_sse
+from app.utils import fast_json
+from app.config import settings
+from typing import Optional, AsyncGenerator, List, Tuple
+from contextlib import aclosing
 import httpx
-import json
+import asyncio
 import time
-import uuid
 
 
-class ChatService:
-    @staticmethod
-    async def get_available_models(db: AsyncSession) -> list:
-        """获取可用模型列表"""
-        channels = await ChannelService.get_channels(db, enabled_only=True)
-        models = []
-        seen = set()
-        for channel in channels:
-            if channel.model_id not in seen:
-                models.append({"id": channel.model_id, "name": channel.name})
-                seen.add(channel.model_id)
-        return models
+# 转发给上游的请求字段
+UPSTREAM_FIELDS = {"model", "messages", "temperature", "max_tokens"}
+
 
+class ChatService:
     @staticmethod
-    async def get_channel_for_model(db: AsyncSession, model_id: str) -> Optional[Channel]:
-        """获取指定模型的可用渠道"""
-        result = await db.execute(
-            select(Channel)
-            .where(Channel.model_id == model_id, Channel.is_enabled == True)
-            .order_by(Channel.id)
-        )
-        return result.scalar_one_or_none()
+    def get_channels_for_model(model_id: str) -> Tuple[ChannelSnapshot, ...]:
+        """获取指定模型的所有可用渠道（读取内存中的渠道注册表）"""
+        return channel_registry.channels_for(model_id)
 
     @staticmethod
     async def stream_chat_completion(
-        db: AsyncSession,
         request: ChatCompletionRequest,
         user_id: Optional[int],
         username: Optional[str],
         ip_address: str,
-    ) -> AsyncGenerator[str, None]:
+    ) -> AsyncGenerator[bytes, None]:
         """流式聊天完成"""
         # 获取渠道
-        channel = await ChatService.get_channel_for_model(db, request.model)
-        if not channel:
-            yield f"data: {json.dumps({'error': {'type': 'model_not_found', 'message': '模型不可用'}})}\n\n"
+        channels = ChatService.get_channels_for_model(request.model)
+        if not channels:
+            yield MODEL_NOT_FOUND_FRAME
             return
 
-        # 检查渠道限流
-        channel_key = f"channel:{channel.id}"
-        allowed, retry_after = await rate_limiter.check_rate_limit(
-            channel_key, channel.rpm_limit
-        )
-        if not allowed:
-            yield f"data: {json.dumps({'error': {'type': 'upstream_rate_limit', 'message': '问的人太多啦，换一个模型试试吧'}})}\n\n"
-            return
+        # 请求体直接由已校验的请求导出，只序列化一次，各次重试复用同一份字节
+        payload = request.model_dump(include=UPSTREAM_FIELDS, exclude_none=True)
+        payload["stream"] = True
+        if not request.max_tokens:
+            payload.pop("max_tokens", None)
+        if settings.UPSTREAM_INCLUDE_USAGE:
+            # 要求上游在最后一帧返回准确的 usage
+            payload["stream_options"] = {"include_usage": True}
+        body = fast_json.dumps(payload)
 
-        # 调用上游 API
-        api_key = channel.api_key
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        }
-
-        payload = {
-            "model": request.model,
-            "messages": [msg.model_dump() for msg in request.messages],
-            "stream": True,
-            "temperature": request.temperature,
-        }
-        if request.max_tokens:
-            payload["max_tokens"] = request.max_tokens
-
-        prompt_tokens = 0
-        completion_tokens = 0
-
-        # 估算 prompt tokens
-        for msg in request.messages:
-            prompt_tokens += estimate_tokens(msg.content)
-
-        try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                async with client.stream(
-                    "POST",
-                    f"{channel.base_url}/chat/completions",
-                    headers=headers,
-                    json=payload,
-                ) as response:
-                    if response.status_code == 429:
-                        yield f"data: {json.dumps({'error': {'type': 'upstream_rate_limit', 'message': '问的人太多啦，换一个模型试试吧'}})}\n\n"
-                        return
-                    if response.status_code != 200:
-                        yield f"data: {json.dumps({'error': {'type': 'upstream_error', 'message': '上游渠道返回错误'}})}\n\n"
+        # 计算 prompt tokens（重复发送的历史消息命中缓存）
+        prompt_tokens = tokenizer_registry.count_messages(request.model, (msg.content for msg in request.messages))
+        tokenizer = tokenizer_registry.for_model(request.model)
+
+        # 首个字节发出前，上游限流、5xx 或连接失败时自动切换到下一个渠道
+        tried: List[int] = []
+        error_frame = None
+        for attempt in range(max(settings.UPSTREAM_MAX_ATTEMPTS, 1)):
+            # 选择渠道（已跳过达到 RPM 上限和已尝试过的渠道）
+            channel, saturated = await channel_router.acquire(channels, exclude=tried)
+            if not channel:
+                if error_frame is None:
+                    error_frame = RATE_LIMIT_FRAME if saturated else MODEL_NOT_FOUND_FRAME
+                break
+            tried.append(channel.id)
+            if attempt:
+                # 确定还有渠道可以重试时才退避等待
+                await asyncio.sleep(settings.UPSTREAM_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
+            # 调用上游 API
+            headers = {
+                "Authorization": f"Bearer {channel.api_key}",
+                "Content-Type": "application/json",
+                # 转发原始字节，要求上游不压缩
+                "Accept-Encoding": "identity",
+            }
+
+            started = False
+            upstream_status = None
+            usage = StreamUsage(prompt_tokens, tokenizer.counter())
+            scanner = SSEScanner(usage)
+            attempt_start = time.monotonic()
+
+            def log_attempt(error_type: Optional[str] = None):
+                """记录本次上游调用（由后台任务批量写入）"""
+                # 首字耗时取扫描器首次提取到非空内容的时刻，不含合并窗口的等待
+                first_content_at = scanner.first_content_at
+                chat_log_writer.submit(
+                    user_id=user_id,
+                    username=username,
+                    ip_address=ip_address,
+                    channel_id=channel.id,
+                    model_id=request.model,
+                    prompt_tokens=usage.prompt_tokens,
+                    completion_tokens=usage.completion_tokens if started or not error_type else 0,
+                    duration_ms=int((time.monotonic() - attempt_start) * 1000),
+                    ttft_ms=int((first_content_at - attempt_start) * 1000) if first_content_at is not None else None,
+                    upstream_status=upstream_status,
+                    error_type=error_type,
+                )
+
+            with channel_router.track(channel.id), upstream_clients.lease(channel.base_url) as client:
+                try:
+                    async with client.stream(
+                        "POST",
+                        f"{channel.base_url}/chat/completions",
+                        headers=headers,
+                        content=body,
+                        timeout=60.0,
+                    ) as response:
+                        upstream_status = response.status_code
+                        if response.status_code == 429:
+                            channel_router.report_failure(channel.id)
+                            log_attempt("upstream_rate_limit")
+                            error_frame = RATE_LIMIT_FRAME
+                            continue
+                        if response.status_code >= 500:
+                            channel_router.report_failure(channel.id)
+                            log_attempt("upstream_error")
+                            error_frame = UPSTREAM_ERROR_FRAME
+                            continue
+                        if response.status_code != 200:
+                            log_attempt("upstream_error")
+                            yield UPSTREAM_ERROR_FRAME
+                            return
+
+                        # 原样转发上游字节，只扫描提取 token 计量所需字段
+                        frames = relay_sse(
+                            response.aiter_raw(),
+                            scanner,
+                            coalesce_window=settings.SSE_COALESCE_MS / 1000,
+                        )
+                        async with aclosing(frames):
+                            async for data in frames:
+                                started = True
+                                yield data
+
+                    channel_router.report_success(channel.id)
+                    log_attempt()
+                    return
+
+                except (GeneratorExit, asyncio.CancelledError):
+                    # 客户端中途断开
+                    log_attempt("client_closed")
+                    raise
+                except Exception as e:
+                    if started:
+                        log_attempt("stream_error")
+                        yield _error_frame("upstream_error", str(e))
                         return
+                    # 尚未向客户端输出内容，可以安全地切换渠道
+                    channel_router.report_failure(channel.id)
+                    log_attempt("connect_error" if isinstance(e, httpx.TransportError) else "upstream_error")
+                    error_frame = _error_frame("upstream_error", str(e))
+
+        yield error_frame
+
+
+def _error_frame(error_type: str, message: str) -> bytes:
+    """构造 SSE 错误帧"""
+    return b"data: " + fast_json.dumps({"error": {"type": error_type, "message": message}}) + b"\n\n"
+
 
-                    completion_text = ""
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            data = line[6:]
-                            if data == "[DONE]":
-                                yield f"data: [DONE]\n\n"
-                                break
-                            yield f"{line}\n\n"
-
-                            # 提取完成文本用于 token 估算
-                            try:
-                                chunk = json.loads(data)
-                                if "choices" in chunk and len(chunk["choices"]) > 0:
-                                    delta = chunk["choices"][0].get("delta", {})
-                                    if "content" in delta:
-                                        completion_text += delta["content"]
-                            except:
-                                pass
-
-            # 估算 completion tokens
-            completion_tokens = estimate_tokens(completion_text)
-
-            # 记录日志
-            log = ChatLog(
-                user_id=user_id,
-                username=username,
-                ip_address=ip_address,
-                channel_id=channel.id,
-                model_id=request.model,
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-            )
-            db.add(log)
-            await db.commit()
-
-        except Exception as e:
-            yield f"data: {json.dumps({'error': {'type': 'upstream_error', 'message': str(e)}})}\n\n"
+# 固定内容的错误帧预先编码
+MODEL_NOT_FOUND_FRAME = _error_frame("model_not_found", "模型不可用")
+RATE_LIMIT_FRAME = _error_frame("upstream_rate_limit", "问的人太多啦，换一个模型试试吧")
+UPSTREAM_ERROR_FRAME = _error_frame("upstream_error", "上游渠道返回错误")
@@ -0,0 +1,110 @@
+from app.config import settings
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+import asyncio
+import httpx
+
+
+def _http2_available() -> bool:
+    """HTTP/2 需要额外安装 h2 包"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class UpstreamClientPool:
+    """上游 HTTP 客户端注册表：每个 base_url 共享一个长连接池"""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        # 每个客户端进行中的请求数
+        self._in_flight: Dict[httpx.AsyncClient, int] = {}
+        # 已被移除但仍有进行中请求的客户端，最后一个请求结束后关闭
+        self._retired: Set[httpx.AsyncClient] = set()
+        self._closing: Set[asyncio.Task] = set()
+        self._http2 = settings.UPSTREAM_HTTP2 and _http2_available()
+        if settings.UPSTREAM_HTTP2 and not self._http2:
+            print("未安装 h2，上游连接回退为 HTTP/1.1")
+
+    @staticmethod
+    def _key(base_url: str) -> str:
+        return base_url.rstrip("/")
+
+    def get_client(self, base_url: str) -> httpx.AsyncClient:
+        """获取指定 base_url 的共享客户端，不存在则创建"""
+        key = self._key(base_url)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+                ),
+                http2=self._http2,
+                timeout=60.0,
+            )
+            self._clients[key] = client
+        return client
+
+    def peek(self, base_url: str) -> Optional[httpx.AsyncClient]:
+        """获取已存在的共享客户端，不存在时不创建"""
+        client = self._clients.get(self._key(base_url))
+        return client if client is not None and not client.is_closed else None
+
+    @contextmanager
+    def lease(self, base_url: str) -> Iterator[httpx.AsyncClient]:
+        """获取共享客户端并登记进行中的请求，客户端被移除后等请求结束再关闭"""
+        client = self.get_client(base_url)
+        self._in_flight[client] = self._in_flight.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            remaining = self._in_flight[client] - 1
+            if remaining:
+                self._in_flight[client] = remaining
+            else:
+                del self._in_flight[client]
+                if client in self._retired:
+                    self._retired.discard(client)
+                    self._close_later(client)
+
+    def _close_later(self, client: httpx.AsyncClient):
+        task = asyncio.get_running_loop().create_task(client.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def discard(self, base_url: str):
+        """
+        移除指定地址的客户端（调用方需确认已没有渠道使用该地址），下次请求时重建
+        没有进行中的请求时立即关闭，否则等最后一个请求结束后关闭
+        """
+        client = self._clients.pop(self._key(base_url), None)
+        if client is None:
+            return
+        if self._in_flight.get(client):
+            self._retired.add(client)
+        else:
+            self._close_later(client)
+
+    def retain(self, base_urls):
+        """只保留仍被使用的地址的客户端，其余按 discard 释放"""
+        keep = {self._key(base_url) for base_url in base_urls}
+        for key in [key for key in self._clients if key not in keep]:
+            self.discard(key)
+
+    async def aclose(self):
+        """关闭所有客户端"""
+        clients = list(self._clients.values()) + list(self._retired)
+        self._clients.clear()
+        self._retired.clear()
+        for client in clients:
+            await client.aclose()
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+
+# 全局上游客户端池
+upstream_clients = UpstreamClientPool()
@@ -0,0 +1,90 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.models import BlockedIP
+from typing import Iterable, Optional
+import ipaddress
+
+
+class _PrefixTrie:
+    """二进制前缀树，按位存储 CIDR 网段"""
+
+    __slots__ = ("_root", "_bits")
+
+    def __init__(self, bits: int):
+        # 节点结构：[0 分支, 1 分支, 是否为网段终点]
+        self._root = [None, None, False]
+        self._bits = bits
+
+    def insert(self, network: int, prefix_len: int):
+        """插入网段（network 为网络地址的整数形式）"""
+        node = self._root
+        for i in range(prefix_len):
+            if node[2]:
+                # 已被更短的前缀覆盖
+                return
+            bit = (network >> (self._bits - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, False]
+            node = node[bit]
+        node[2] = True
+        # 更长的前缀已被当前网段覆盖，剪枝
+        node[0] = node[1] = None
+
+    def contains(self, address: int) -> bool:
+        """判断地址是否命中任一网段，耗时 O(前缀长度)"""
+        node = self._root
+        for i in range(self._bits):
+            if node[2]:
+                return True
+            node = node[(address >> (self._bits - 1 - i)) & 1]
+            if node is None:
+                return False
+        return node[2]
+
+
+class IPBlocklist:
+    """内存中的 IP 黑名单索引，数据变更时整体重建后原子替换"""
+
+    def __init__(self):
+        self._tries = {4: _PrefixTrie(32), 6: _PrefixTrie(128)}
+        self._size = 0
+
+    def rebuild(self, ip_ranges: Iterable[str]):
+        """根据 IP / CIDR 列表重建索引"""
+        tries = {4: _PrefixTrie(32), 6: _PrefixTrie(128)}
+        size = 0
+        for ip_range in ip_ranges:
+            try:
+                network = ipaddress.ip_network(ip_range.strip(), strict=False)
+            except ValueError:
+                continue
+            tries[network.version].insert(int(network.network_address), network.prefixlen)
+            size += 1
+        # 单次赋值替换，读取方不会看到构建中的状态
+        self._tries = tries
+        self._size = size
+
+    async def reload(self, db: AsyncSession):
+        """从数据库加载黑名单并重建索引"""
+        result = await db.execute(select(BlockedIP.ip_address))
+        self.rebuild(result.scalars().all())
+
+    def is_blocked(self, ip: Optional[str]) -> bool:
+        """检查 IP 是否被禁用"""
+        if not ip or not self._size:
+            return False
+        try:
+            ip_obj = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        # IPv4 映射的 IPv6 地址按 IPv4 处理
+        if ip_obj.version == 6 and ip_obj.ipv4_mapped:
+            ip_obj = ip_obj.ipv4_mapped
+        return self._tries[ip_obj.version].contains(int(ip_obj))
+
+    def __len__(self) -> int:
+        return self._size
+
+
+# 全局 IP 黑名单实例
+ip_blocklist = IPBlocklist()
@@ -0,0 +1,149 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from app.models import ChatLog
+from app.services.log_archive import log_archive
+from datetime import datetime
+from typing import Dict, List, Optional
+import math
+
+# 时间粒度对应的 strftime 格式
+GRANULARITY_FORMATS = {
+    "minute": "%Y-%m-%d %H:%M",
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+}
+
+
+def percentile(sorted_values: List[int], p: float) -> Optional[int]:
+    """最近秩法计算百分位数，输入需已排序"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class _Group:
+    __slots__ = ("requests", "errors", "durations", "ttfts")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.durations: List[int] = []
+        self.ttfts: List[int] = []
+
+    def add(self, duration_ms: Optional[int], ttft_ms: Optional[int], error_type: Optional[str]):
+        self.requests += 1
+        if error_type:
+            self.errors += 1
+        # 延迟只统计成功的调用
+        elif duration_ms is not None:
+            self.durations.append(duration_ms)
+            if ttft_ms is not None:
+                self.ttfts.append(ttft_ms)
+
+    def summary(self) -> dict:
+        self.durations.sort()
+        self.ttfts.sort()
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_p50": percentile(self.durations, 50),
+            "latency_p90": percentile(self.durations, 90),
+            "latency_p99": percentile(self.durations, 99),
+            "ttft_p50": percentile(self.ttfts, 50),
+            "ttft_p90": percentile(self.ttfts, 90),
+            "ttft_p99": percentile(self.ttfts, 99),
+        }
+
+
+class LogAnalytics:
+    @staticmethod
+    async def latency_percentiles(
+        db: AsyncSession,
+        start: datetime,
+        end: datetime,
+        granularity: str = "hour",
+        channel_id: Optional[int] = None,
+        model_id: Optional[str] = None,
+        include_archive: bool = False,
+    ) -> List[dict]:
+        """
+        按时间粒度、渠道、模型分组统计耗时与首字耗时的 p50/p90/p99
+        结果按分组顺序流式读取，内存只保留当前分组的数据；
+        include_archive 时合并归档中的历史日志，需同时保留所有分组
+        """
+        bucket = func.strftime(GRANULARITY_FORMATS[granularity], ChatLog.created_at).label("bucket")
+        query = (
+            select(
+                bucket,
+                ChatLog.channel_id,
+                ChatLog.model_id,
+                ChatLog.duration_ms,
+                ChatLog.ttft_ms,
+                ChatLog.error_type,
+            )
+            .where(ChatLog.created_at >= start, ChatLog.created_at < end)
+            .order_by(bucket, ChatLog.channel_id, ChatLog.model_id)
+        )
+        if channel_id is not None:
+            query = query.where(ChatLog.channel_id == channel_id)
+        if model_id:
+            query = query.where(ChatLog.model_id == model_id)
+
+        if include_archive:
+            return await LogAnalytics._with_archive(db, query, start, end, granularity, channel_id, model_id)
+
+        results = []
+        current_key = None
+        group = None
+        stream = await db.stream(query.execution_options(yield_per=5000))
+        async for row in stream:
+            key = (row.bucket, row.channel_id, row.model_id)
+            if key != current_key:
+                if group is not None:
+                    results.append(_row(current_key, group))
+                current_key = key
+                group = _Group()
+            group.add(row.duration_ms, row.ttft_ms, row.error_type)
+        if group is not None:
+            results.append(_row(current_key, group))
+        return results
+
+    @staticmethod
+    async def _with_archive(db, query, start, end, granularity, channel_id, model_id) -> List[dict]:
+        groups: Dict[tuple, _Group] = {}
+
+        def add(key, duration_ms, ttft_ms, error_type):
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = _Group()
+            group.add(duration_ms, ttft_ms, error_type)
+
+        stream = await db.stream(query.execution_options(yield_per=5000))
+        async for row in stream:
+            add((row.bucket, row.channel_id, row.model_id), row.duration_ms, row.ttft_ms, row.error_type)
+
+        def predicate(record: dict) -> bool:
+            return (channel_id is None or record.get("channel_id") == channel_id) and (
+                not model_id or record.get("model_id") == model_id
+            )
+
+        bucket_format = GRANULARITY_FORMATS[granularity]
+        async for records in log_archive.iter_batches(start, end, predicate):
+            for record in records:
+                # 与 end 为开区间的数据库查询保持一致
+                if record["created_at"] >= end:
+                    continue
+                key = (record["created_at"].strftime(bucket_format), record.get("channel_id"), record["model_id"])
+                add(key, record.get("duration_ms"), record.get("ttft_ms"), record.get("error_type"))
+
+        # None 不能与字符串比较，排序时置于最前
+        return [
+            _row(key, groups[key])
+            for key in sorted(groups, key=lambda k: (k[0], k[1] is not None, k[1] or 0, k[2]))
+        ]
+
+
+def _row(key, group: _Group) -> dict:
+    bucket, channel_id, model_id = key
+    return {"bucket": bucket, "channel_id": channel_id, "model_id": model_id, **group.summary()}
@@ -0,0 +1,285 @@
+from sqlalchemy import select, delete
+from app.database import AsyncSessionLocal
+from app.models import ChatLog
+from app.utils import fast_json, to_naive_utc
+from app.config import settings
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, List, Optional
+import asyncio
+import gzip
+import json
+import os
+
+MANIFEST_NAME = "manifest.json"
+# 归档保存 chat_logs 的全部字段
+ARCHIVE_FIELDS = [column.key for column in ChatLog.__table__.columns]
+
+
+class _SegmentReader:
+    """顺序读取一个归档段，最多读取清单中记录的行数"""
+
+    def __init__(self, path: str, rows: int):
+        self._file = gzip.open(path, "rt", encoding="utf-8")
+        self._remaining = rows
+
+    def read(self, count: int) -> List[dict]:
+        records = []
+        try:
+            while self._remaining > 0 and len(records) < count:
+                line = self._file.readline()
+                if not line:
+                    break
+                self._remaining -= 1
+                record = fast_json.loads(line)
+                if record.get("created_at"):
+                    record["created_at"] = to_naive_utc(datetime.fromisoformat(record["created_at"]))
+                records.append(record)
+        except (EOFError, gzip.BadGzipFile):
+            # 清单之外的残缺尾部（写入中途崩溃），忽略
+            self._remaining = 0
+        return records
+
+    def close(self):
+        self._file.close()
+
+
+class LogArchive:
+    """
+    冷日志归档
+
+    超过 after_days 的日志按月份写入 gzip 压缩的 NDJSON 段文件（chat_logs-YYYY-MM.ndjson.gz），
+    每批追加为一个新的 gzip member，文件只追加不改写。manifest.json 记录每个段的有效字节数
+    与行数：追加前先截断到清单记录的长度，丢弃崩溃留下的残缺数据；清单落盘后才删除数据库中的
+    对应日志，删除前崩溃则在下次运行时按清单中的待删除 id 补删，保证日志不丢不重。
+    """
+
+    def __init__(self, directory: str, after_days: int = 0, batch_size: int = 5000, interval: int = 3600):
+        self._directory = directory
+        self._after_days = after_days
+        self._batch_size = batch_size
+        self._interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._manifest: Optional[dict] = None
+        # 统计指标
+        self._last_run: Optional[datetime] = None
+        self._last_archived = 0
+        self._total_archived = 0
+        self._last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._after_days > 0
+
+    @property
+    def after_days(self) -> int:
+        return self._after_days
+
+    # ---------- 清单 ----------
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self._directory, MANIFEST_NAME)
+
+    def _load_manifest(self) -> dict:
+        if self._manifest is None:
+            try:
+                with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                    self._manifest = json.load(f)
+            except FileNotFoundError:
+                self._manifest = {"version": 1, "segments": {}, "pending_delete": []}
+        return self._manifest
+
+    def _save_manifest(self):
+        """先写临时文件再原子替换，清单任何时刻都是完整的"""
+        path = self._manifest_path()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    # ---------- 写入 ----------
+
+    def _append(self, rows: List[dict]):
+        """把一批日志按月追加到段文件，并在清单中登记待删除的 id（在线程中执行）"""
+        os.makedirs(self._directory, exist_ok=True)
+        manifest = self._load_manifest()
+
+        by_month: Dict[str, List[dict]] = {}
+        for row in rows:
+            by_month.setdefault(row["created_at"].strftime("%Y-%m"), []).append(row)
+
+        for month, month_rows in by_month.items():
+            segment = manifest["segments"].setdefault(month, {
+                "file": f"chat_logs-{month}.ndjson.gz",
+                "rows": 0,
+                "bytes": 0,
+                "min_created_at": None,
+                "max_created_at": None,
+            })
+            lines = b"".join(
+                fast_json.dumps({**row, "created_at": row["created_at"].isoformat()}) + b"\n"
+                for row in month_rows
+            )
+            data = gzip.compress(lines)
+
+            path = os.path.join(self._directory, segment["file"])
+            with open(path, "ab") as f:
+                # 丢弃清单之外的残缺尾部
+                if f.tell() != segment["bytes"]:
+                    f.truncate(segment["bytes"])
+                    f.seek(segment["bytes"])
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+            first = min(row["created_at"] for row in month_rows).isoformat()
+            last = max(row["created_at"] for row in month_rows).isoformat()
+            segment["rows"] += len(month_rows)
+            segment["bytes"] += len(data)
+            segment["min_created_at"] = min(filter(None, [segment["min_created_at"], first]))
+            segment["max_created_at"] = max(filter(None, [segment["max_created_at"], last]))
+
+        manifest["pending_delete"] = [row["id"] for row in rows]
+        self._save_manifest()
+
+    async def _finish_pending(self):
+        """删除已归档但尚未从数据库删除的日志"""
+        manifest = await asyncio.to_thread(self._load_manifest)
+        pending = manifest.get("pending_delete")
+        if not pending:
+            return
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(ChatLog).where(ChatLog.id.in_(pending)))
+            await db.commit()
+        manifest["pending_delete"] = []
+        await asyncio.to_thread(self._save_manifest)
+
+    async def run_once(self, max_age_days: Optional[int] = None) -> int:
+        """
+        归档超过期限的日志，返回归档条数
+        max_age_days 可进一步收紧期限（保留期短于归档期限时，保证清理前先归档）
+        """
+        if not self.enabled:
+            return 0
+        days = self._after_days if max_age_days is None else min(self._after_days, max_age_days)
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        archived = 0
+        async with self._lock:
+            try:
+                await self._finish_pending()
+                while True:
+                    async with AsyncSessionLocal() as db:
+                        result = await db.execute(
+                            select(*ChatLog.__table__.columns)
+                            .where(ChatLog.created_at < cutoff)
+                            .order_by(ChatLog.id)
+                            .limit(self._batch_size)
+                        )
+                        rows = [dict(row) for row in result.mappings()]
+                    if not rows:
+                        break
+                    await asyncio.to_thread(self._append, rows)
+                    await self._finish_pending()
+                    archived += len(rows)
+                    if len(rows) < self._batch_size:
+                        break
+                    # 让出写锁
+                    await asyncio.sleep(0.05)
+                self._last_error = None
+            except Exception as e:
+                self._last_error = f"{type(e).__name__}: {e}"
+                print(f"日志归档失败: {self._last_error}")
+            self._last_run = datetime.utcnow()
+            self._last_archived = archived
+            self._total_archived += archived
+        return archived
+
+    async def _run(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self._interval)
+
+    def start(self):
+        """启动定时归档（未开启归档或 interval 为 0 时不启动，此时只在日志清理前归档）"""
+        if self.enabled and self._interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------- 读取 ----------
+
+    async def iter_batches(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        predicate: Optional[Callable[[dict], bool]] = None,
+        batch_size: int = 2000,
+    ) -> AsyncIterator[List[dict]]:
+        """
+        按月份从新到旧读取归档中落在 [start, end] 内的日志，逐批返回
+        段内按归档顺序输出；文件读取与解压在线程中进行，不阻塞事件循环
+        """
+        # 归档时间为无时区的 UTC，筛选边界统一换算后再比较
+        start = to_naive_utc(start)
+        end = to_naive_utc(end)
+        manifest = await asyncio.to_thread(self._load_manifest)
+        segments = dict(manifest["segments"])
+        start_month = start.strftime("%Y-%m") if start else None
+        end_month = end.strftime("%Y-%m") if end else None
+
+        for month in sorted(segments, reverse=True):
+            if (start_month and month < start_month) or (end_month and month > end_month):
+                continue
+            segment = segments[month]
+            path = os.path.join(self._directory, segment["file"])
+            if not os.path.exists(path):
+                continue
+            reader = await asyncio.to_thread(_SegmentReader, path, segment["rows"])
+            try:
+                while True:
+                    records = await asyncio.to_thread(reader.read, batch_size)
+                    if not records:
+                        break
+                    matched = [
+                        record for record in records
+                        if (start is None or record["created_at"] >= start)
+                        and (end is None or record["created_at"] <= end)
+                        and (predicate is None or predicate(record))
+                    ]
+                    if matched:
+                        yield matched
+            finally:
+                reader.close()
+
+    def metrics(self) -> dict:
+        manifest = self._manifest or {"segments": {}}
+        segments = manifest["segments"]
+        return {
+            "enabled": self.enabled,
+            "after_days": self._after_days,
+            "segments": len(segments),
+            "archived_rows": sum(segment["rows"] for segment in segments.values()),
+            "archived_bytes": sum(segment["bytes"] for segment in segments.values()),
+            "last_run": self._last_run.isoformat() if self._last_run else None,
+            "last_archived": self._last_archived,
+            "total_archived": self._total_archived,
+            "last_error": self._last_error,
+        }
+
+
+# 全局日志归档
+log_archive = LogArchive(
+    directory=settings.LOG_ARCHIVE_DIR or os.path.join(os.path.dirname(settings.DATABASE_PATH), "archive"),
+    after_days=settings.LOG_ARCHIVE_AFTER_DAYS,
+    batch_size=settings.LOG_RETENTION_BATCH_SIZE,
+    interval=settings.LOG_ARCHIVE_INTERVAL_SECONDS,
+)
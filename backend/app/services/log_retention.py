@@ -0,0 +1,128 @@
+from sqlalchemy import select, delete
+from app.database import AsyncSessionLocal, engine
+from app.models import ChatLog
+from app.services.system_config import system_config
+from app.services.log_archive import log_archive
+from app.config import settings
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import time
+
+
+class LogRetentionJob:
+    """
+    日志保留期清理任务
+
+    按 system_config 中的 log_retention_days 定期删除过期日志，开启归档时先归档再删除。
+    每批删除单独提交，批次之间让出事件循环，避免长时间占用 SQLite 写锁阻塞日志写入；
+    清理后回收空闲页并更新统计信息。
+    """
+
+    def __init__(self, interval: int = 3600, batch_size: int = 5000, vacuum_pages: int = 2000):
+        self._interval = interval
+        self._batch_size = batch_size
+        self._vacuum_pages = vacuum_pages
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        # 统计指标
+        self._runs = 0
+        self._total_purged = 0
+        self._last_purged = 0
+        self._last_run: Optional[datetime] = None
+        self._last_duration_ms: Optional[int] = None
+        self._last_error: Optional[str] = None
+
+    async def _purge_batch(self, cutoff: datetime) -> int:
+        """删除一批过期日志，返回删除条数"""
+        async with AsyncSessionLocal() as db:
+            expired = (
+                select(ChatLog.id)
+                .where(ChatLog.created_at < cutoff)
+                .order_by(ChatLog.created_at)
+                .limit(self._batch_size)
+            )
+            result = await db.execute(delete(ChatLog).where(ChatLog.id.in_(expired)))
+            await db.commit()
+            return result.rowcount
+
+    async def _compact(self, analyze: bool):
+        """回收空闲页（需 auto_vacuum=INCREMENTAL），有删除时更新查询规划统计"""
+        async with engine.connect() as conn:
+            # incremental_vacuum 每执行一步只回收一页，普通 execute 只会执行一步，
+            # 通过驱动的 executescript 执行到结束
+            raw = await conn.get_raw_connection()
+            script = f"PRAGMA incremental_vacuum({self._vacuum_pages});"
+            if analyze:
+                script += " ANALYZE chat_logs;"
+            await raw.driver_connection.executescript(script)
+
+    async def run_once(self) -> int:
+        """执行一次清理，返回删除的日志条数"""
+        async with self._lock:
+            retention_days = system_config.snapshot.log_retention_days
+            started = time.monotonic()
+            purged = 0
+            archived = 0
+            try:
+                if log_archive.enabled:
+                    # 先把冷日志移入归档；保留期更短时按保留期归档，确保不会删除未归档的日志
+                    archived = await log_archive.run_once(max_age_days=retention_days if retention_days > 0 else None)
+                if retention_days > 0:
+                    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+                    while True:
+                        deleted = await self._purge_batch(cutoff)
+                        purged += deleted
+                        if deleted < self._batch_size:
+                            break
+                        # 让出写锁，让排队中的日志写入先执行
+                        await asyncio.sleep(0.05)
+                    # 每次最多回收 vacuum_pages 页，大量删除后的空闲页分多次回收
+                    await self._compact(analyze=purged + archived > 0)
+                self._last_error = None
+            except Exception as e:
+                self._last_error = f"{type(e).__name__}: {e}"
+                print(f"日志清理失败: {self._last_error}")
+            self._runs += 1
+            self._last_purged = purged
+            self._total_purged += purged
+            self._last_run = datetime.utcnow()
+            self._last_duration_ms = int((time.monotonic() - started) * 1000)
+            return purged
+
+    async def _run(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self._interval)
+
+    def start(self):
+        """启动定时清理（interval 为 0 时不启动）"""
+        if self._interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "retention_days": system_config.snapshot.log_retention_days,
+            "runs": self._runs,
+            "last_run": self._last_run.isoformat() if self._last_run else None,
+            "last_purged": self._last_purged,
+            "total_purged": self._total_purged,
+            "last_duration_ms": self._last_duration_ms,
+            "last_error": self._last_error,
+        }
+
+
+# 全局日志清理任务
+log_retention = LogRetentionJob(
+    interval=settings.LOG_RETENTION_INTERVAL_SECONDS,
+    batch_size=settings.LOG_RETENTION_BATCH_SIZE,
+)
@@ -0,0 +1,92 @@
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy import select, text, literal_column
+from sqlalchemy.exc import OperationalError
+from app.models import ChatLog
+
+FTS_TABLE = "chat_logs_fts"
+# 三元组分词至少需要 3 个字符才能命中索引
+MIN_QUERY_LENGTH = 3
+
+# 外部内容 FTS5 表：只存索引不存原文，由触发器与 chat_logs 同步
+FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        username, ip_address,
+        content='chat_logs', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS chat_logs_fts_ai AFTER INSERT ON chat_logs BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, username, ip_address)
+        VALUES (new.id, new.username, new.ip_address);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS chat_logs_fts_ad AFTER DELETE ON chat_logs BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, username, ip_address)
+        VALUES ('delete', old.id, old.username, old.ip_address);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS chat_logs_fts_au AFTER UPDATE OF username, ip_address ON chat_logs BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, username, ip_address)
+        VALUES ('delete', old.id, old.username, old.ip_address);
+        INSERT INTO {FTS_TABLE}(rowid, username, ip_address)
+        VALUES (new.id, new.username, new.ip_address);
+    END
+    """,
+]
+
+
+class LogSearchIndex:
+    """
+    日志用户名 / IP 子串搜索索引（SQLite FTS5 trigram）
+
+    SQLite 未编译 FTS5 或版本不支持 trigram 时自动停用，搜索回退为 LIKE 扫描。
+    """
+
+    def __init__(self):
+        self.enabled = False
+
+    async def ensure(self, engine: AsyncEngine):
+        """创建索引表与同步触发器；首次创建时用现有日志重建索引"""
+        try:
+            async with engine.begin() as conn:
+                result = await conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": FTS_TABLE},
+                )
+                exists = result.first() is not None
+                for ddl in FTS_DDL:
+                    await conn.execute(text(ddl))
+                if not exists:
+                    await conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            self.enabled = True
+        except OperationalError as e:
+            self.enabled = False
+            print(f"日志全文索引不可用，搜索将回退为 LIKE: {e.orig}")
+
+    async def rebuild(self, engine: AsyncEngine):
+        """按 chat_logs 全量重建索引"""
+        async with engine.begin() as conn:
+            await conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+    def contains(self, column, value: str):
+        """
+        生成“列包含子串”的筛选条件
+        索引可用且查询不少于 3 个字符时走 FTS，否则使用 LIKE
+        """
+        if not self.enabled or len(value) < MIN_QUERY_LENGTH:
+            return column.like(f"%{value}%")
+        # 列过滤 + 短语查询，短语内的双引号需转义
+        phrase = '"' + value.replace('"', '""') + '"'
+        matches = (
+            select(literal_column("rowid"))
+            .select_from(text(FTS_TABLE))
+            .where(literal_column(FTS_TABLE).op("MATCH")(f"{column.key} : {phrase}"))
+        )
+        return ChatLog.id.in_(matches)
+
+
+# 全局日志搜索索引
+log_search = LogSearchIndex()
@@ -0,0 +1,141 @@
+from sqlalchemy import insert
+from app.database import AsyncSessionLocal
+from app.models import ChatLog
+from app.services.usage_rollup import UsageRollup
+from app.config import settings
+from datetime import datetime
+from typing import List, Optional
+import asyncio
+
+
+class ChatLogWriter:
+    """
+    聊天日志异步批量写入器
+
+    请求路径只把日志放入有界队列，由单个后台任务按条数或时间间隔
+    批量插入，避免每条消息单独开启一次 SQLite 写事务。
+    写入失败时整批回滚，按指数退避重试有限次数，仍失败才丢弃。
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        max_queue: int = 10000,
+        max_retries: int = 3,
+        retry_backoff: float = 0.2,
+    ):
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_retries = max(0, max_retries)
+        self._retry_backoff = retry_backoff
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        # 统计指标
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._retries = 0
+        self._batches = 0
+
+    def submit(self, **fields) -> bool:
+        """提交一条日志，队列已满时丢弃并计数"""
+        fields.setdefault("created_at", datetime.utcnow())
+        try:
+            self._queue.put_nowait(fields)
+            return True
+        except asyncio.QueueFull:
+            self._dropped += 1
+            return False
+
+    async def _collect(self) -> List[dict]:
+        """收集一批日志：凑满 batch_size 条或等待 flush_interval 后返回"""
+        batch: List[dict] = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._flush_interval
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0 or self._closing:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _insert(self, batch: List[dict]):
+        """在一个事务内批量插入"""
+        async with AsyncSessionLocal() as db:
+            # 先写日志以取得写锁，再在同一事务内累加汇总表
+            await db.execute(insert(ChatLog), batch)
+            await UsageRollup.apply(db, batch)
+            await db.commit()
+
+    async def _write(self, batch: List[dict]):
+        """写入一批日志，失败时退避重试（事务整体回滚，重试不会重复写入）"""
+        for attempt in range(self._max_retries + 1):
+            try:
+                await self._insert(batch)
+                self._written += len(batch)
+                self._batches += 1
+                return
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if attempt < self._max_retries:
+                    self._retries += 1
+                    delay = self._retry_backoff * (2 ** attempt)
+                    print(f"日志写入失败（{len(batch)} 条），{delay:.2f} 秒后重试: {error}")
+                    await asyncio.sleep(delay)
+        self._failed += len(batch)
+        print(f"日志写入失败，已丢弃 {len(batch)} 条（累计丢弃 {self._failed} 条）: {error}")
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if batch:
+                await self._write(batch)
+            if self._closing and self._queue.empty():
+                return
+
+    def start(self):
+        """启动后台写入任务"""
+        if self._task is None:
+            self._closing = False
+            # 队列绑定到首次使用它的事件循环，空队列在启动时重建
+            if self._queue.empty():
+                self._queue = asyncio.Queue(maxsize=self._queue.maxsize)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """写完队列中剩余的日志后停止"""
+        if self._task is not None:
+            self._closing = True
+            await self._task
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "written": self._written,
+            "dropped": self._dropped,
+            "failed": self._failed,
+            "retries": self._retries,
+            "batches": self._batches,
+        }
+
+
+# 全局日志写入器
+chat_log_writer = ChatLogWriter(
+    batch_size=settings.LOG_WRITER_BATCH_SIZE,
+    flush_interval=settings.LOG_WRITER_FLUSH_MS / 1000,
+    max_queue=settings.LOG_WRITER_QUEUE_SIZE,
+    max_retries=settings.LOG_WRITER_MAX_RETRIES,
+    retry_backoff=settings.LOG_WRITER_RETRY_BACKOFF_MS / 1000,
+)
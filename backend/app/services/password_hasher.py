@@ -0,0 +1,92 @@
+from app.utils import get_password_hash, verify_password, password_needs_rehash
+from app.config import settings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+import asyncio
+import threading
+import time
+
+T = TypeVar("T")
+
+
+class PasswordHasher:
+    """
+    在独立线程池中计算密码哈希
+
+    PBKDF2 计算期间释放 GIL，放到线程中执行后事件循环不再被阻塞，流式响应不受登录影响。
+    线程数即同时计算的上限，超出的请求在池中排队；单独的线程池避免占满 asyncio 默认线程池。
+    """
+
+    def __init__(self, workers: int = 2):
+        self._workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="password-hash")
+        # 统计指标（工作线程与事件循环都会修改，需加锁）
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._waiting = 0
+        self._running = 0
+        self._total_queue_ms = 0.0
+        self._max_queue_ms = 0.0
+        self._total_hash_ms = 0.0
+
+    def _timed(self, func: Callable[..., T], submitted: float, *args) -> T:
+        """在工作线程中执行，记录排队时间与计算时间"""
+        started = time.perf_counter()
+        queue_ms = (started - submitted) * 1000
+        with self._stats_lock:
+            self._waiting -= 1
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            hash_ms = (time.perf_counter() - started) * 1000
+            with self._stats_lock:
+                self._running -= 1
+                self._calls += 1
+                self._total_queue_ms += queue_ms
+                self._max_queue_ms = max(self._max_queue_ms, queue_ms)
+                self._total_hash_ms += hash_ms
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        with self._stats_lock:
+            self._waiting += 1
+        future = self._executor.submit(self._timed, func, time.perf_counter(), *args)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, future):
+        # 排队中被取消（如客户端断开）的任务不会执行 _timed，在此扣除排队数
+        if future.cancelled():
+            with self._stats_lock:
+                self._waiting -= 1
+
+    async def hash(self, password: str) -> str:
+        """生成密码哈希"""
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """验证密码"""
+        return await self._run(verify_password, password, hashed_password)
+
+    @staticmethod
+    def needs_rehash(hashed_password: str) -> bool:
+        return password_needs_rehash(hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def metrics(self) -> dict:
+        calls = self._calls
+        return {
+            "workers": self._workers,
+            "running": self._running,
+            "waiting": self._waiting,
+            "calls": calls,
+            "avg_queue_ms": round(self._total_queue_ms / calls, 2) if calls else 0,
+            "max_queue_ms": round(self._max_queue_ms, 2),
+            "avg_hash_ms": round(self._total_hash_ms / calls, 2) if calls else 0,
+        }
+
+
+# 全局密码哈希线程池
+password_hasher = PasswordHasher(workers=settings.PASSWORD_HASH_WORKERS)
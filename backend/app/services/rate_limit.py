@@ -1,59 +1,260 @@
-from collections import defaultdict
-from datetime import datetime, timedelta
-from typing import Dict, Optional
+from app.config import settings
+from collections import deque
+from typing import Deque, Dict, Optional
 import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
 
 
-class RateLimiter:
+class MemoryRateLimitBackend:
+    """
+    进程内存储：每个键只保存一个浮点数（理论到达时间 TAT）
+
+    检查和更新之间没有 await，在事件循环内天然是原子的，无需加锁。
+    """
+
     def __init__(self):
-        # 存储限流数据：{key: [(timestamp, count)]}
-        self._limits: Dict[str, list] = defaultdict(list)
-        self._lock = asyncio.Lock()
+        # 存储限流数据：{key: 理论到达时间（monotonic 秒）}
+        self._tat: Dict[str, float] = {}
+        # 滑动窗口计数：{key: 窗口内各次请求的过期时间（monotonic 秒）}
+        self._windows: Dict[str, Deque[float]] = {}
+
+    async def acquire(self, key: str, interval: float, burst: int) -> Optional[float]:
+        """尝试占用一个配额，成功返回 None，失败返回需要等待的秒数"""
+        now = time.monotonic()
+        tat = max(self._tat.get(key, now), now) + interval
+        allow_at = tat - burst * interval
+        if allow_at > now:
+            return allow_at - now
+        self._tat[key] = tat
+        return None
+
+    async def acquire_window(self, key: str, limit: int, window: float) -> Optional[float]:
+        """滑动窗口：任意 window 秒内最多 limit 次，成功返回 None，失败返回需要等待的秒数"""
+        now = time.monotonic()
+        hits = self._windows.get(key)
+        if hits is None:
+            hits = self._windows[key] = deque()
+        while hits and hits[0] <= now:
+            hits.popleft()
+        if len(hits) >= limit:
+            return hits[0] - now
+        hits.append(now + window)
+        return None
+
+    async def evict(self):
+        """清理已完全恢复的键"""
+        now = time.monotonic()
+        expired = [key for key, tat in self._tat.items() if tat <= now]
+        for key in expired:
+            del self._tat[key]
+        expired = [key for key, hits in self._windows.items() if not hits or hits[-1] <= now]
+        for key in expired:
+            del self._windows[key]
+
+    def close(self):
+        self._tat.clear()
+        self._windows.clear()
+
+
+class SQLiteRateLimitBackend:
+    """
+    基于 SQLite WAL 文件的共享存储，同一主机上的多个 uvicorn worker 共用计数
+
+    占用配额是单条 UPSERT 语句，由 SQLite 保证跨进程原子性；
+    时间使用墙上时钟，以便不同进程之间可比较。
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """首次使用时打开连接（调用方需持有锁）"""
+        if self._conn is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # 限流状态可丢失，无需每次落盘
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_hits (key TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_rate_limit_hits_key_expires ON rate_limit_hits (key, expires)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _acquire(self, key: str, interval: float, burst: int) -> Optional[float]:
+        now = time.time()
+        span = burst * interval
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                """
+                INSERT INTO rate_limits (key, tat) VALUES (:key, :now + :interval)
+                ON CONFLICT(key) DO UPDATE SET tat = max(tat, :now) + :interval
+                WHERE max(tat, :now) + :interval - :now <= :span
+                RETURNING tat
+                """,
+                {"key": key, "now": now, "interval": interval, "span": span},
+            ).fetchone()
+            if row is not None:
+                return None
+            row = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return interval
+        return max(row[0], now) + interval - span - now
+
+    async def acquire(self, key: str, interval: float, burst: int) -> Optional[float]:
+        """尝试占用一个配额，成功返回 None，失败返回需要等待的秒数"""
+        return await asyncio.to_thread(self._acquire, key, interval, burst)
+
+    def _acquire_window(self, key: str, limit: int, window: float) -> Optional[float]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # IMMEDIATE 事务持有写锁，计数与写入之间其他进程无法插入
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM rate_limit_hits WHERE key = ? AND expires <= ?", (key, now))
+                count, oldest = conn.execute(
+                    "SELECT count(*), min(expires) FROM rate_limit_hits WHERE key = ?", (key,)
+                ).fetchone()
+                if count >= limit:
+                    conn.execute("COMMIT")
+                    return oldest - now
+                conn.execute("INSERT INTO rate_limit_hits (key, expires) VALUES (?, ?)", (key, now + window))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return None
+
+    async def acquire_window(self, key: str, limit: int, window: float) -> Optional[float]:
+        """滑动窗口：任意 window 秒内最多 limit 次，成功返回 None，失败返回需要等待的秒数"""
+        return await asyncio.to_thread(self._acquire_window, key, limit, window)
 
-    async def check_rate_limit(self, key: str, limit: int, window: int = 60) -> tuple[bool, Optional[int]]:
+    def _evict(self):
+        with self._lock:
+            now = time.time()
+            conn = self._connection()
+            conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+            conn.execute("DELETE FROM rate_limit_hits WHERE expires <= ?", (now,))
+
+    async def evict(self):
+        """清理已完全恢复的键"""
+        await asyncio.to_thread(self._evict)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def create_backend():
+    """按配置创建限流存储后端"""
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return MemoryRateLimitBackend()
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        path = settings.RATE_LIMIT_DB_PATH or os.path.join(
+            os.path.dirname(settings.DATABASE_PATH), "rate_limit.db"
+        )
+        return SQLiteRateLimitBackend(path)
+    raise ValueError(f"未知的限流存储后端: {settings.RATE_LIMIT_BACKEND}")
+
+
+class RateLimiter:
+    """
+    限流器，支持两种算法，状态存放在可替换的后端中（进程内存或跨进程共享的 SQLite）：
+
+    - 滑动窗口（默认）：任意连续 window 秒内最多 limit 次，与 RPM 的字面含义一致；
+    - GCRA（通用信元速率算法）：突发系数大于 0 时启用，每个键只保存理论到达时间（TAT），
+      单次检查为 O(1)，请求按 window / limit 的间隔平滑放行，并允许 limit × 系数 的瞬时突发。
+      代价是任意连续 window 秒内最多可放行约 limit × (1 + 系数) 次。
+
+    渠道限流对应上游的 RPM 配额，始终使用滑动窗口。
+    """
+
+    def __init__(self, backend=None, burst_ratio: float = 0.0, cleanup_interval: int = 60):
+        self.backend = backend or MemoryRateLimitBackend()
+        self._burst_ratio = burst_ratio
+        self._cleanup_interval = cleanup_interval
+        self._cleanup_task: Optional[asyncio.Task] = None
+
+    async def check_rate_limit(
+        self,
+        key: str,
+        limit: int,
+        window: int = 60,
+        burst: Optional[int] = None,
+        strict: bool = False,
+    ) -> tuple[bool, Optional[int]]:
         """
         检查是否超过限流
         :param key: 限流键（IP、用户ID、渠道ID等）
-        :param limit: 限制次数
+        :param limit: 时间窗口内的限制次数
         :param window: 时间窗口（秒）
+        :param burst: 允许的突发请求数（使用 GCRA），默认按 limit * 突发系数计算，系数为 0 时使用滑动窗口
+        :param strict: 为 True 时始终使用滑动窗口，保证任意 window 秒内不超过 limit 次
         :return: (是否允许, 重试等待时间)
         """
-        async with self._lock:
-            now = datetime.utcnow()
-            cutoff = now - timedelta(seconds=window)
-
-            # 清理过期记录
-            self._limits[key] = [
-                (ts, count) for ts, count in self._limits[key] if ts > cutoff
-            ]
-
-            # 计算当前窗口内的请求数
-            current_count = sum(count for _, count in self._limits[key])
-
-            if current_count >= limit:
-                # 计算最早的请求何时过期
-                if self._limits[key]:
-                    oldest_ts = self._limits[key][0][0]
-                    retry_after = int((oldest_ts + timedelta(seconds=window) - now).total_seconds())
-                    return False, max(retry_after, 1)
-                return False, window
-
-            # 记录本次请求
-            self._limits[key].append((now, 1))
-            return True, None
+        if limit <= 0:
+            return False, window
+        if burst is None and self._burst_ratio > 0:
+            burst = max(int(limit * self._burst_ratio), 1)
+
+        if strict or burst is None:
+            wait = await self.backend.acquire_window(key, limit, window)
+        else:
+            wait = await self.backend.acquire(key, window / limit, burst)
+        if wait is not None:
+            return False, max(math.ceil(wait), 1)
+        return True, None
 
     async def cleanup(self):
-        """清理过期数据"""
-        async with self._lock:
-            now = datetime.utcnow()
-            cutoff = now - timedelta(minutes=5)
-            for key in list(self._limits.keys()):
-                self._limits[key] = [
-                    (ts, count) for ts, count in self._limits[key] if ts > cutoff
-                ]
-                if not self._limits[key]:
-                    del self._limits[key]
+        """清理已完全恢复的键"""
+        await self.backend.evict()
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(self._cleanup_interval)
+            try:
+                await self.cleanup()
+            except Exception as e:
+                print(f"限流数据清理失败: {e}")
+
+    def start(self):
+        """启动后台清理任务"""
+        if self._cleanup_task is None:
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+
+    async def stop(self):
+        """停止后台清理任务并释放后端"""
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            try:
+                await self._cleanup_task
+            except asyncio.CancelledError:
+                pass
+            self._cleanup_task = None
+        self.backend.close()
 
 
 # 全局限流器实例
-rate_limiter = RateLimiter()
+rate_limiter = RateLimiter(
+    create_backend(),
+    burst_ratio=settings.RATE_LIMIT_BURST_RATIO,
+    cleanup_interval=settings.RATE_LIMIT_CLEANUP_INTERVAL,
+)
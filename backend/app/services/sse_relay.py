@@ -0,0 +1,166 @@
+from app.services.token_accounting import StreamUsage
+from typing import AsyncIterator, List, Optional
+import asyncio
+import json
+import re
+import time
+
+# 只提取需要的字段，不做完整 JSON 解析
+_CONTENT_PATTERN = re.compile(rb'"content"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_PROMPT_TOKENS_PATTERN = re.compile(rb'"prompt_tokens"\s*:\s*(\d+)')
+_COMPLETION_TOKENS_PATTERN = re.compile(rb'"completion_tokens"\s*:\s*(\d+)')
+_DONE = b"[DONE]"
+# 合并模式下读取上游与写出客户端之间最多缓存的块数；客户端读得慢时读取任务在 put 处等待，
+# 背压传回上游连接，不会无限占用内存
+MAX_PENDING_CHUNKS = 64
+
+
+class SSEScanner:
+    """
+    上游 SSE 字节流扫描器
+
+    只转发完整的行（不完整的尾部留到下一块），原样保留上游字节；
+    逐行用正则提取内容增量和 usage 供 token 计量，遇到 [DONE] 后停止。
+    first_content_at 记录首次提取到非空内容的时刻（time.monotonic），在合并窗口等待之前记录。
+    """
+
+    __slots__ = ("_usage", "_pending", "done", "first_content_at")
+
+    def __init__(self, usage: StreamUsage):
+        self._usage = usage
+        self._pending = b""
+        self.done = False
+        self.first_content_at: Optional[float] = None
+
+    def feed(self, chunk: bytes) -> bytes:
+        """输入一块上游字节，返回可以转发给客户端的字节"""
+        data = self._pending + chunk if self._pending else chunk
+        end = data.rfind(b"\n") + 1
+        if not end:
+            self._pending = data
+            return b""
+        self._pending = data[end:]
+        complete = data[:end]
+
+        offset = 0
+        for line in complete.split(b"\n"):
+            line_end = offset + len(line) + 1
+            if line.startswith(b"data:"):
+                payload = line[5:].strip()
+                if payload == _DONE:
+                    self.done = True
+                    self._pending = b""
+                    # 截断到 [DONE] 所在行，并补齐事件分隔空行
+                    return complete[:line_end] + b"\n"
+                self._account(payload)
+            offset = line_end
+        return complete
+
+    def _account(self, payload: bytes):
+        if b'"usage"' in payload:
+            prompt_tokens = _PROMPT_TOKENS_PATTERN.search(payload)
+            completion_tokens = _COMPLETION_TOKENS_PATTERN.search(payload)
+            if completion_tokens:
+                self._usage.observe_usage({
+                    "prompt_tokens": int(prompt_tokens.group(1)) if prompt_tokens else None,
+                    "completion_tokens": int(completion_tokens.group(1)),
+                })
+        if self._usage.from_upstream and self.first_content_at is not None:
+            return
+        match = _CONTENT_PATTERN.search(payload)
+        if match:
+            raw = match.group(1)
+            if not raw:
+                # 首帧通常只有 role，内容为空
+                return
+            if self.first_content_at is None:
+                self.first_content_at = time.monotonic()
+            if self._usage.from_upstream:
+                return
+            if b"\\" in raw:
+                # 只有含转义序列时才需要解码 JSON 字符串
+                try:
+                    content = json.loads(b'"' + raw + b'"')
+                except ValueError:
+                    return
+            else:
+                content = raw.decode("utf-8", "replace")
+            if content:
+                self._usage.add_delta(content)
+
+    def flush(self) -> bytes:
+        """上游结束时返回剩余的不完整行"""
+        rest, self._pending = self._pending, b""
+        return rest + b"\n\n" if rest.strip() else b""
+
+
+async def relay_sse(
+    chunks: AsyncIterator[bytes],
+    scanner: SSEScanner,
+    coalesce_window: float = 0.0,
+    max_pending: int = MAX_PENDING_CHUNKS,
+) -> AsyncIterator[bytes]:
+    """
+    转发上游 SSE 字节流
+
+    coalesce_window > 0 时由后台任务读取上游，窗口期内到达的多个帧合并为一次输出，
+    减少每个 token 一次 socket 写入的开销；窗口为 0 时逐块转发。
+    两者之间的队列最多缓存 max_pending 块，队列满时暂停读取上游。
+    """
+    if coalesce_window <= 0:
+        async for chunk in chunks:
+            data = scanner.feed(chunk)
+            if data:
+                yield data
+            if scanner.done:
+                return
+        tail = scanner.flush()
+        if tail:
+            yield tail
+        return
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+    finished = object()
+
+    async def pump():
+        try:
+            async for chunk in chunks:
+                data = scanner.feed(chunk)
+                if data:
+                    await queue.put(data)
+                if scanner.done:
+                    break
+            else:
+                tail = scanner.flush()
+                if tail:
+                    await queue.put(tail)
+            await queue.put(finished)
+        except Exception as e:
+            await queue.put(e)
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            item = await queue.get()
+            if item is not finished and not isinstance(item, Exception):
+                # 收到首帧后整体等待一个窗口，再一次性取出窗口内到达的所有帧；
+                # 每批只有一次定时等待，不为每个 token 创建等待任务
+                await asyncio.sleep(coalesce_window)
+                batch: List[bytes] = [item]
+                while not queue.empty():
+                    item = queue.get_nowait()
+                    if item is finished or isinstance(item, Exception):
+                        break
+                    batch.append(item)
+                yield b"".join(batch)
+            if item is finished:
+                return
+            if isinstance(item, Exception):
+                raise item
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
@@ -0,0 +1,207 @@
+from app.utils.http_cache import etag_matches
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:  # 未安装时只使用构建产物中已有的 .br 文件
+    brotli = None
+
+# 带内容哈希的构建产物目录，文件名变化即内容变化，可永久缓存
+IMMUTABLE_PREFIX = "/assets/"
+IMMUTABLE_CACHE_CONTROL = b"public, max-age=31536000, immutable"
+# 其余文件（index.html 等）每次凭 ETag 重新验证
+REVALIDATE_CACHE_CONTROL = b"no-cache"
+# 这些路径交给应用处理，不作为前端路由
+PASSTHROUGH_PREFIXES = ("/api", "/docs", "/redoc", "/openapi.json", "/health")
+# 小于该大小的文件压缩收益有限
+COMPRESS_MIN_SIZE = 1024
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "application/wasm",
+    "application/xml",
+    "image/svg+xml",
+)
+# Accept-Encoding 协商的优先顺序
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@dataclass(frozen=True)
+class _Variant:
+    """某个编码下的响应体与预先构建好的响应头"""
+
+    body: bytes
+    etag: str
+    headers: List[Tuple[bytes, bytes]]
+    not_modified_headers: List[Tuple[bytes, bytes]]
+
+
+@dataclass(frozen=True)
+class _Entry:
+    variants: Dict[str, _Variant]
+
+    def select(self, accept_encoding: str) -> _Variant:
+        if len(self.variants) > 1 and accept_encoding:
+            accepted = _parse_accept_encoding(accept_encoding)
+            for encoding, _ in ENCODINGS:
+                if encoding in self.variants and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                    return self.variants[encoding]
+        return self.variants["identity"]
+
+
+def _parse_accept_encoding(value: str) -> Dict[str, float]:
+    accepted = {}
+    for item in value.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def _media_type(path: str) -> str:
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+class StaticSite:
+    """
+    前端构建产物（frontend/dist）的内存清单
+
+    启动时一次性读入全部文件（通常只有数 MB），并为可压缩的文件准备 br/gzip 版本：
+    优先使用构建产物中已有的 .br/.gz 文件，否则在内存中压缩（brotli 需安装 brotli 包）。
+    响应头预先构建，请求时只做字典查找与 Accept-Encoding 协商，不访问文件系统。
+    """
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        self._entries: Dict[str, _Entry] = {}
+        self._index: Optional[_Entry] = None
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self):
+        """扫描构建目录并重建清单"""
+        entries = {}
+        for root, _, files in os.walk(self._directory):
+            names = set(files)
+            for name in files:
+                # 预压缩文件作为原文件的编码版本，不单独提供
+                if name.endswith((".br", ".gz")) and name[:-3] in names:
+                    continue
+                path = os.path.join(root, name)
+                url_path = "/" + os.path.relpath(path, self._directory).replace(os.sep, "/")
+                entries[url_path] = self._build_entry(url_path, path)
+        self._entries = entries
+        self._index = entries.get("/index.html")
+
+    def _build_entry(self, url_path: str, path: str) -> _Entry:
+        with open(path, "rb") as f:
+            body = f.read()
+        media_type = _media_type(path)
+        digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+        cache_control = IMMUTABLE_CACHE_CONTROL if url_path.startswith(IMMUTABLE_PREFIX) else REVALIDATE_CACHE_CONTROL
+
+        bodies = {"identity": body}
+        if len(body) >= COMPRESS_MIN_SIZE and media_type.startswith(COMPRESSIBLE_TYPES):
+            for encoding, suffix in ENCODINGS:
+                if os.path.exists(path + suffix):
+                    with open(path + suffix, "rb") as f:
+                        bodies[encoding] = f.read()
+                elif encoding == "gzip":
+                    bodies[encoding] = gzip.compress(body, compresslevel=9, mtime=0)
+                elif encoding == "br" and brotli is not None:
+                    bodies[encoding] = brotli.compress(body, quality=11)
+            # 压缩后没有变小的版本不提供
+            bodies = {
+                encoding: data for encoding, data in bodies.items()
+                if encoding == "identity" or len(data) < len(body)
+            }
+
+        variants = {}
+        for encoding, data in bodies.items():
+            etag = f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+            common = [(b"etag", etag.encode()), (b"cache-control", cache_control)]
+            if len(bodies) > 1:
+                common.append((b"vary", b"Accept-Encoding"))
+            headers = common + [
+                (b"content-type", media_type.encode()),
+                (b"content-length", str(len(data)).encode()),
+            ]
+            if encoding != "identity":
+                headers.append((b"content-encoding", encoding.encode()))
+            variants[encoding] = _Variant(body=data, etag=etag, headers=headers, not_modified_headers=common)
+        return _Entry(variants=variants)
+
+    def lookup(self, path: str) -> Optional[_Entry]:
+        """按请求路径查找文件；/assets/ 以外未命中的路径回退到 index.html（SPA 路由）"""
+        if path == "/":
+            return self._index
+        entry = self._entries.get(path)
+        if entry is None and not path.startswith(IMMUTABLE_PREFIX):
+            return self._index
+        return entry
+
+
+class StaticSiteMiddleware:
+    """
+    在最外层直接响应前端静态请求
+
+    GET/HEAD 的非 API 路径不经过 IP 黑名单、CORS 等中间件与路由，直接由内存清单返回。
+    """
+
+    def __init__(self, app, site: StaticSite):
+        self.app = app
+        self.site = site
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or scope["path"].startswith(PASSTHROUGH_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        entry = self.site.lookup(scope["path"])
+        if entry is None:
+            await send({
+                "type": "http.response.start",
+                "status": 404,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", b"9")],
+            })
+            await send({"type": "http.response.body", "body": b"Not Found" if scope["method"] == "GET" else b""})
+            return
+
+        accept_encoding = ""
+        if_none_match = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+            elif name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+
+        variant = entry.select(accept_encoding)
+        if if_none_match and etag_matches(if_none_match, variant.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": variant.not_modified_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({"type": "http.response.start", "status": 200, "headers": variant.headers})
+        await send({"type": "http.response.body", "body": variant.body if scope["method"] == "GET" else b""})
@@ -0,0 +1,76 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.database import AsyncSessionLocal
+from app.models import SystemConfig
+from app.config import settings
+from dataclasses import dataclass
+from typing import Dict, Optional
+import asyncio
+
+
+@dataclass(frozen=True)
+class SystemConfigSnapshot:
+    """系统配置快照（不可变），未配置的项使用 settings 默认值"""
+
+    guest_rpm: int = settings.GUEST_RPM
+    user_rpm: int = settings.USER_RPM
+    log_retention_days: int = settings.LOG_RETENTION_DAYS
+    allow_registration: bool = True
+
+    @classmethod
+    def from_rows(cls, configs: Dict[str, str]) -> "SystemConfigSnapshot":
+        return cls(
+            guest_rpm=int(configs.get("guest_rpm", settings.GUEST_RPM)),
+            user_rpm=int(configs.get("user_rpm", settings.USER_RPM)),
+            log_retention_days=int(configs.get("log_retention_days", settings.LOG_RETENTION_DAYS)),
+            allow_registration=configs.get("allow_registration", "true").lower() == "true",
+        )
+
+
+class SystemConfigStore:
+    """进程内系统配置缓存：启动时加载，修改后整体替换"""
+
+    def __init__(self, refresh_interval: int = 0):
+        self._snapshot = SystemConfigSnapshot()
+        self._refresh_interval = refresh_interval
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot(self) -> SystemConfigSnapshot:
+        return self._snapshot
+
+    async def reload(self, db: AsyncSession) -> SystemConfigSnapshot:
+        """从数据库重新加载配置"""
+        result = await db.execute(select(SystemConfig))
+        configs = {config.key: config.value for config in result.scalars().all()}
+        # 单次赋值替换，读取方拿到的始终是完整快照
+        self._snapshot = SystemConfigSnapshot.from_rows(configs)
+        return self._snapshot
+
+    async def _refresh_loop(self):
+        """定期刷新，感知绕过 API 直接修改数据库的情况"""
+        while True:
+            await asyncio.sleep(self._refresh_interval)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.reload(db)
+            except Exception as e:
+                print(f"系统配置刷新失败: {e}")
+
+    def start(self):
+        """启动定时刷新（refresh_interval 为 0 时不启动）"""
+        if self._refresh_interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+
+# 全局系统配置
+system_config = SystemConfigStore(refresh_interval=settings.CONFIG_REFRESH_SECONDS)
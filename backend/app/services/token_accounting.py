@@ -0,0 +1,49 @@
+from app.utils import TokenCounter
+from typing import Optional
+
+
+class StreamUsage:
+    """
+    单次流式调用的 token 计量
+
+    每个内容增量只累加计数、不保留文本，内存占用与回答长度无关；
+    上游返回 usage 时以上游数据为准，否则使用估算值。
+    """
+
+    __slots__ = ("_estimated_prompt_tokens", "_completion", "_upstream_prompt_tokens", "_upstream_completion_tokens")
+
+    def __init__(self, estimated_prompt_tokens: int, counter=None):
+        self._estimated_prompt_tokens = estimated_prompt_tokens
+        # counter 需提供 add(text) 与 tokens，默认按字符估算
+        self._completion = counter if counter is not None else TokenCounter()
+        self._upstream_prompt_tokens: Optional[int] = None
+        self._upstream_completion_tokens: Optional[int] = None
+
+    def add_delta(self, text: str):
+        """累加一个内容增量"""
+        self._completion.add(text)
+
+    def observe_usage(self, usage: dict):
+        """记录上游返回的 usage（include_usage 时通常在最后一帧）"""
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        if isinstance(prompt_tokens, int):
+            self._upstream_prompt_tokens = prompt_tokens
+        if isinstance(completion_tokens, int):
+            self._upstream_completion_tokens = completion_tokens
+
+    @property
+    def from_upstream(self) -> bool:
+        return self._upstream_completion_tokens is not None
+
+    @property
+    def prompt_tokens(self) -> int:
+        if self._upstream_prompt_tokens is not None:
+            return self._upstream_prompt_tokens
+        return self._estimated_prompt_tokens
+
+    @property
+    def completion_tokens(self) -> int:
+        if self._upstream_completion_tokens is not None:
+            return self._upstream_completion_tokens
+        return self._completion.tokens
@@ -0,0 +1,201 @@
+from app.utils import LRUCache, TokenCounter, estimate_tokens
+from app.config import settings
+from typing import Dict, Iterable, Optional
+import hashlib
+import os
+
+# 短文本直接计数，哈希与查缓存反而更慢
+CACHE_MIN_LENGTH = 64
+
+# tiktoken 词表文件不含预分词正则，按编码名选择
+TIKTOKEN_PATTERNS = {
+    "r50k_base": r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+    "p50k_base": r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+    "cl100k_base": r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+""",
+    "o200k_base": "|".join([
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]*[\p{Ll}\p{Lm}\p{Lo}\p{M}]+(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]+[\p{Ll}\p{Lm}\p{Lo}\p{M}]*(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+        r"""\p{N}{1,3}""",
+        r""" ?[^\s\p{L}\p{N}]+[\r\n/]*""",
+        r"""\s*[\r\n]+""",
+        r"""\s+(?!\S)""",
+        r"""\s+""",
+    ]),
+}
+
+
+class EstimateTokenizer:
+    """按字符类别估算（默认，无需词表）"""
+
+    name = "estimate"
+
+    def count(self, text: str) -> int:
+        return estimate_tokens(text)
+
+    def counter(self) -> TokenCounter:
+        return TokenCounter()
+
+
+class _SumCounter:
+    """逐段精确分词并累加，用于流式回答"""
+
+    __slots__ = ("_tokenizer", "tokens")
+
+    def __init__(self, tokenizer):
+        self._tokenizer = tokenizer
+        self.tokens = 0
+
+    def add(self, text: str):
+        self.tokens += self._tokenizer.count(text)
+
+
+class TiktokenTokenizer:
+    """本地 tiktoken 词表（<name>.tiktoken），需安装 tiktoken"""
+
+    def __init__(self, name: str, path: str):
+        import tiktoken
+        from tiktoken.load import load_tiktoken_bpe
+
+        self.name = name
+        self._encoding = tiktoken.Encoding(
+            name=name,
+            pat_str=TIKTOKEN_PATTERNS.get(name, TIKTOKEN_PATTERNS["cl100k_base"]),
+            mergeable_ranks=load_tiktoken_bpe(path),
+            special_tokens={},
+        )
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode_ordinary(text))
+
+    def counter(self) -> _SumCounter:
+        return _SumCounter(self)
+
+
+class HFTokenizer:
+    """本地 HuggingFace tokenizer.json（<name>.json），需安装 tokenizers"""
+
+    def __init__(self, name: str, path: str):
+        from tokenizers import Tokenizer
+
+        self.name = name
+        self._tokenizer = Tokenizer.from_file(path)
+
+    def count(self, text: str) -> int:
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def counter(self) -> _SumCounter:
+        return _SumCounter(self)
+
+
+# 词表文件扩展名 → 分词器实现
+TOKENIZER_LOADERS = {
+    ".tiktoken": TiktokenTokenizer,
+    ".json": HFTokenizer,
+}
+
+
+def parse_model_map(value: str) -> Dict[str, str]:
+    """解析 "模型前缀=词表名,模型前缀=词表名" 格式的映射"""
+    mapping = {}
+    for item in value.split(","):
+        if "=" in item:
+            prefix, name = item.split("=", 1)
+            if prefix.strip() and name.strip():
+                mapping[prefix.strip()] = name.strip()
+    return mapping
+
+
+class TokenizerRegistry:
+    """
+    按模型 ID 选择分词器的注册表
+
+    模型 ID 按最长前缀匹配词表名，词表从 vocab_dir 中加载；未配置、文件缺失或
+    缺少可选依赖时回退为估算。消息计数结果按内容哈希缓存，客户端每轮重发的历史消息只计算一次。
+    """
+
+    def __init__(self, vocab_dir: str = "", model_map: Optional[Dict[str, str]] = None, cache_size: int = 8192):
+        self._vocab_dir = vocab_dir
+        self._model_map = model_map or {}
+        self._fallback = EstimateTokenizer()
+        self._tokenizers: Dict[str, object] = {}
+        self._resolved: Dict[str, object] = {}
+        self._cache = LRUCache(cache_size)
+        self._hits = 0
+        self._misses = 0
+
+    def register(self, name: str, tokenizer):
+        """注册自定义分词器（需提供 name、count、counter）"""
+        self._tokenizers[name] = tokenizer
+        self._resolved.clear()
+
+    def _load(self, name: str):
+        if name in self._tokenizers:
+            return self._tokenizers[name]
+        tokenizer = None
+        for extension, loader in TOKENIZER_LOADERS.items():
+            path = os.path.join(self._vocab_dir, name + extension)
+            if not os.path.exists(path):
+                continue
+            try:
+                tokenizer = loader(name, path)
+            except ImportError as e:
+                print(f"分词器 {name} 缺少依赖（{e.name}），回退为估算")
+            except Exception as e:
+                print(f"分词器 {name} 加载失败，回退为估算: {e}")
+            break
+        else:
+            print(f"未找到分词器词表 {name}，回退为估算")
+        # 失败也记录，避免每次请求重复尝试
+        self._tokenizers[name] = tokenizer or self._fallback
+        return self._tokenizers[name]
+
+    def for_model(self, model_id: str):
+        """获取模型对应的分词器"""
+        tokenizer = self._resolved.get(model_id)
+        if tokenizer is None:
+            matches = [prefix for prefix in self._model_map if model_id.startswith(prefix)]
+            if matches:
+                tokenizer = self._load(self._model_map[max(matches, key=len)])
+            else:
+                tokenizer = self._fallback
+            self._resolved[model_id] = tokenizer
+        return tokenizer
+
+    def preload(self):
+        """预先加载所有已配置的词表（加载较慢，应在线程中调用）"""
+        for name in set(self._model_map.values()):
+            self._load(name)
+
+    def count(self, model_id: str, text: str) -> int:
+        """计算文本 token 数，长文本结果按内容哈希缓存"""
+        tokenizer = self.for_model(model_id)
+        if len(text) < CACHE_MIN_LENGTH:
+            return tokenizer.count(text)
+        key = (tokenizer.name, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+        tokens = self._cache.get(key)
+        if tokens is None:
+            self._misses += 1
+            tokens = tokenizer.count(text)
+            self._cache.set(key, tokens)
+        else:
+            self._hits += 1
+        return tokens
+
+    def count_messages(self, model_id: str, contents: Iterable[str]) -> int:
+        return sum(self.count(model_id, content) for content in contents)
+
+    def metrics(self) -> dict:
+        return {
+            "loaded": sorted(name for name, tokenizer in self._tokenizers.items() if tokenizer is not self._fallback),
+            "cache_size": len(self._cache),
+            "cache_hits": self._hits,
+            "cache_misses": self._misses,
+        }
+
+
+# 全局分词器注册表
+tokenizer_registry = TokenizerRegistry(
+    vocab_dir=settings.TOKENIZER_DIR or os.path.join(os.path.dirname(settings.DATABASE_PATH), "tokenizers"),
+    model_map=parse_model_map(settings.TOKENIZER_MODELS),
+    cache_size=settings.TOKEN_COUNT_CACHE_SIZE,
+)
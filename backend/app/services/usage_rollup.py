@@ -0,0 +1,101 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, text
+from app.models import ChatLog, ChatLogDaily
+from app.utils.hll import HyperLogLog
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def _day_of(created_at) -> str:
+    if isinstance(created_at, datetime):
+        return created_at.strftime("%Y-%m-%d")
+    return str(created_at)[:10]
+
+
+class UsageRollup:
+    """chat_log_daily 汇总表的增量维护"""
+
+    @staticmethod
+    def aggregate(rows: Iterable[dict], buckets: Optional[Dict] = None) -> Dict[Tuple[str, str], dict]:
+        """把日志行按 (日期, 模型) 聚合，可在已有结果上继续累加"""
+        if buckets is None:
+            buckets = {}
+        for row in rows:
+            # 只统计成功的调用
+            if row.get("error_type"):
+                continue
+            key = (_day_of(row["created_at"]), row["model_id"])
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {
+                    "calls": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "sketch": HyperLogLog(),
+                }
+            bucket["calls"] += 1
+            bucket["prompt_tokens"] += row.get("prompt_tokens") or 0
+            bucket["completion_tokens"] += row.get("completion_tokens") or 0
+            if row.get("user_id") is not None:
+                bucket["sketch"].add(row["user_id"])
+        return buckets
+
+    @staticmethod
+    async def apply(db: AsyncSession, rows: Iterable[dict]):
+        """
+        把一批新日志累加到汇总表（不提交事务）
+        调用方应先在同一事务内写入日志，确保已持有写锁，避免并发的读改写
+        """
+        await UsageRollup._store(db, UsageRollup.aggregate(rows))
+
+    @staticmethod
+    async def _store(db: AsyncSession, buckets: Dict[Tuple[str, str], dict]):
+        for (day, model_id), bucket in buckets.items():
+            result = await db.execute(
+                select(ChatLogDaily).where(ChatLogDaily.day == day, ChatLogDaily.model_id == model_id)
+            )
+            daily = result.scalar_one_or_none()
+            if daily is None:
+                daily = ChatLogDaily(
+                    day=day,
+                    model_id=model_id,
+                    calls=0,
+                    prompt_tokens=0,
+                    completion_tokens=0,
+                )
+                db.add(daily)
+            daily.calls += bucket["calls"]
+            daily.prompt_tokens += bucket["prompt_tokens"]
+            daily.completion_tokens += bucket["completion_tokens"]
+            sketch = HyperLogLog.from_bytes(daily.user_sketch)
+            sketch.merge(bucket["sketch"])
+            daily.user_sketch = sketch.to_bytes()
+
+    @staticmethod
+    async def backfill(db: AsyncSession, batch_size: int = 10000) -> int:
+        """
+        根据现有日志重建汇总表，返回处理的日志条数
+        读取日志与替换汇总表在同一个写事务内完成（BEGIN IMMEDIATE 先取得写锁），
+        期间日志写入器的批量写入在锁上等待，不会被重建覆盖或重复累加；需传入未执行过语句的会话
+        """
+        await db.execute(text("BEGIN IMMEDIATE"))
+        buckets: Dict[Tuple[str, str], dict] = {}
+        total = 0
+        result = await db.stream(
+            select(
+                ChatLog.user_id,
+                ChatLog.model_id,
+                ChatLog.prompt_tokens,
+                ChatLog.completion_tokens,
+                ChatLog.error_type,
+                ChatLog.created_at,
+            ).execution_options(yield_per=batch_size)
+        )
+        async for partition in result.mappings().partitions():
+            UsageRollup.aggregate(partition, buckets)
+            total += len(partition)
+
+        await db.execute(delete(ChatLogDaily))
+        await UsageRollup._store(db, buckets)
+        await db.commit()
+        return total
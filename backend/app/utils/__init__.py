@@ -2,16 +2,25 @@
 from app.utils.security import (
     verify_password,
     get_password_hash,
+    password_needs_rehash,
     create_access_token,
     decode_access_token,
 )
-from app.utils.helpers import is_ip_in_range, estimate_tokens
+from app.utils.helpers import is_ip_in_range, estimate_tokens, TokenCounter, encode_cursor, decode_cursor, to_naive_utc, parse_utc_datetime
+from app.utils.cache import LRUCache
 
 __all__ = [
     "verify_password",
     "get_password_hash",
+    "password_needs_rehash",
     "create_access_token",
     "decode_access_token",
     "is_ip_in_range",
     "estimate_tokens",
+    "TokenCounter",
+    "encode_cursor",
+    "decode_cursor",
+    "to_naive_utc",
+    "parse_utc_datetime",
+    "LRUCache",
 ]
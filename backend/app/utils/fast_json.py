@@ -0,0 +1,54 @@
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import Any, Iterable, List, Type
+import json
+
+try:
+    import orjson
+except ImportError:  # 未安装时回退到标准库
+    orjson = None
+
+
+def _default(obj: Any):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """序列化为 UTF-8 JSON 字节"""
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> bytes:
+        """序列化为 UTF-8 JSON 字节"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+    loads = json.loads
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 orjson 渲染的 JSON 响应（应用默认响应类）"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def project(rows: Iterable[Any], schema: Type[BaseModel]) -> List[dict]:
+    """
+    按响应模型的字段直接取值，跳过 pydantic 的逐行校验
+    用于数据来自数据库、结构已确定的大列表；rows 可以是 ORM 对象或映射
+    """
+    fields = list(schema.model_fields)
+    result = []
+    for row in rows:
+        if isinstance(row, dict) or hasattr(row, "keys"):
+            result.append({field: row.get(field) for field in fields})
+        else:
+            result.append({field: getattr(row, field, None) for field in fields})
+    return result
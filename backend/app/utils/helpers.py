@@ -1,4 +1,8 @@
+import base64
 import ipaddress
+import json
+import re
+from datetime import datetime, timezone
 from typing import Optional
 
 
@@ -15,16 +19,86 @@ def is_ip_in_range(ip: str, ip_range: str) -> bool:
         return False
 
 
+# 按约 1.5 字符/token 计数的字符：中日韩统一表意文字（含扩展区、兼容区）、假名、谚文、
+# 全角标点与符号；其余字符按约 4 字符/token 计数
+_CJK_PATTERN = re.compile(
+    "["
+    "\u3000-\u303f"  # CJK 标点
+    "\u3040-\u30ff"  # 平假名、片假名
+    "\u3400-\u4dbf"  # 扩展 A
+    "\u4e00-\u9fff"  # 基本区
+    "\uac00-\ud7af"  # 谚文音节
+    "\uf900-\ufaff"  # 兼容表意文字
+    "\uff00-\uffef"  # 全角字符
+    "\U00020000-\U0003134f"  # 扩展 B 及以后
+    "]+"
+)
+
+
+def count_cjk_chars(text: str) -> int:
+    """统计中日韩字符数（正则替换在 C 层完成，无逐字符 Python 循环）"""
+    if text.isascii():
+        return 0
+    return len(text) - len(_CJK_PATTERN.sub("", text))
+
+
+class TokenCounter:
+    """
+    增量估算 token 数量：只累计字符计数，不保留文本
+    估算规则与 estimate_tokens 相同
+    """
+
+    __slots__ = ("chinese_chars", "other_chars")
+
+    def __init__(self):
+        self.chinese_chars = 0
+        self.other_chars = 0
+
+    def add(self, text: str):
+        chinese = count_cjk_chars(text)
+        self.chinese_chars += chinese
+        self.other_chars += len(text) - chinese
+
+    @property
+    def tokens(self) -> int:
+        return max(int(self.chinese_chars / 1.5 + self.other_chars / 4), 1)
+
+
 def estimate_tokens(text: str) -> int:
     """
     估算文本的 token 数量
-    简单估算：1 token ≈ 4 个字符（英文）或 1.5 个字符（中文）
+    简单估算：1 token ≈ 4 个字符（英文）或 1.5 个字符（中日韩）
     """
-    # 统计中文字符数
-    chinese_chars = sum(1 for char in text if '\u4e00' <= char <= '\u9fff')
-    # 统计其他字符数
-    other_chars = len(text) - chinese_chars
-
-    # 估算 tokens
-    tokens = int(chinese_chars / 1.5 + other_chars / 4)
-    return max(tokens, 1)
+    counter = TokenCounter()
+    counter.add(text)
+    return counter.tokens
+
+
+def encode_cursor(*values) -> str:
+    """把分页位置编码为不透明的游标字符串"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """解析游标，格式错误时抛出 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("无效的游标") from e
+    if not isinstance(values, list):
+        raise ValueError("无效的游标")
+    return values
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """带时区的时间转换为 UTC 后去掉时区；日志时间统一按无时区的 UTC 存储与比较"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_utc_datetime(value: str) -> datetime:
+    """解析 ISO 8601 时间（可带 Z 或时区偏移），返回无时区的 UTC 时间"""
+    return to_naive_utc(datetime.fromisoformat(value))
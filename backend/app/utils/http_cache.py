@@ -0,0 +1,45 @@
+from fastapi import Request, Response
+from app.utils.fast_json import dumps
+from dataclasses import dataclass
+from typing import Any
+import hashlib
+
+
+@dataclass(frozen=True)
+class CachedJSON:
+    """预先序列化的 JSON 响应体及其强 ETag（按内容摘要生成，多 worker 间一致）"""
+
+    body: bytes
+    etag: str
+
+    @classmethod
+    def build(cls, content: Any) -> "CachedJSON":
+        body = dumps(content)
+        digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+        return cls(body=body, etag=f'"{digest}"')
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """判断 If-None-Match 是否命中（弱比较，支持多个值与 *）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cached_json_response(request: Request, cached: CachedJSON, max_age: int = 0) -> Response:
+    """返回预序列化的响应体，客户端缓存仍有效时返回 304"""
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"public, max-age={max_age}, must-revalidate" if max_age > 0 else "no-cache",
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
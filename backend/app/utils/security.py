@@ -1,32 +1,54 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from app.config import settings
+from app.utils.cache import LRUCache
 import hashlib
 import secrets
+import time
 
 # 使用 PBKDF2-SHA256 替代 bcrypt，支持任意长度密码
-HASH_ITERATIONS = 100000  # PBKDF2 迭代次数
+HASH_ALGORITHM = 'pbkdf2_sha256'
+HASH_ITERATIONS = settings.PASSWORD_HASH_ITERATIONS  # 新哈希使用的 PBKDF2 迭代次数
+LEGACY_HASH_ITERATIONS = 100000  # 旧格式（不含迭代次数）固定的迭代次数
 
+# 已验证 Token 的缓存：{token: payload}，命中时只需检查过期时间
+_token_cache = LRUCache(settings.TOKEN_CACHE_SIZE)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证密码"""
-    try:
-        # 格式: algorithm$salt$hash
-        parts = hashed_password.split('$')
-        if len(parts) != 3:
-            return False
 
+def _parse_password_hash(hashed_password: str) -> Optional[Tuple[int, str, str]]:
+    """解析密码哈希，返回 (迭代次数, salt, hash)，格式无效时返回 None"""
+    # 格式: algorithm$iterations$salt$hash，旧格式: algorithm$salt$hash
+    parts = hashed_password.split('$')
+    if len(parts) == 4:
+        algorithm, iterations, salt, stored_hash = parts
+        if not iterations.isdigit():
+            return None
+        iterations = int(iterations)
+    elif len(parts) == 3:
         algorithm, salt, stored_hash = parts
-        if algorithm != 'pbkdf2_sha256':
+        iterations = LEGACY_HASH_ITERATIONS
+    else:
+        return None
+    if algorithm != HASH_ALGORITHM:
+        return None
+    return iterations, salt, stored_hash
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """验证密码（CPU 密集，异步代码中应通过 password_hasher 调用）"""
+    try:
+        parsed = _parse_password_hash(hashed_password)
+        if parsed is None:
             return False
+        iterations, salt, stored_hash = parsed
 
-        # 使用相同的 salt 计算哈希
+        # 使用相同的 salt 与迭代次数计算哈希
         password_hash = hashlib.pbkdf2_hmac(
             'sha256',
             plain_password.encode('utf-8'),
             bytes.fromhex(salt),
-            HASH_ITERATIONS
+            iterations
         ).hex()
 
         # 常量时间比较，防止时序攻击
@@ -36,7 +58,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 
 def get_password_hash(password: str) -> str:
-    """生成密码哈希"""
+    """生成密码哈希（CPU 密集，异步代码中应通过 password_hasher 调用）"""
     # 生成随机 salt (32 字节)
     salt = secrets.token_bytes(32)
 
@@ -48,8 +70,14 @@ def get_password_hash(password: str) -> str:
         HASH_ITERATIONS
     ).hex()
 
-    # 返回格式: algorithm$salt$hash
-    return f'pbkdf2_sha256${salt.hex()}${password_hash}'
+    # 返回格式: algorithm$iterations$salt$hash
+    return f'{HASH_ALGORITHM}${HASH_ITERATIONS}${salt.hex()}${password_hash}'
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """哈希参数与当前配置不一致（旧格式或迭代次数变化）时需要重新哈希"""
+    parts = hashed_password.split('$')
+    return len(parts) != 4 or parts[1] != str(HASH_ITERATIONS)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -65,9 +93,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 def decode_access_token(token: str) -> Optional[dict]:
-    """解码 JWT Token"""
+    """解码 JWT Token（已验证过的 Token 直接从缓存返回）"""
+    payload = _token_cache.get(token)
+    if payload is not None:
+        if payload.get("exp", 0) > time.time():
+            # 返回副本，调用方修改不会影响缓存
+            return dict(payload)
+        _token_cache.pop(token)
+        return None
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         return None
+    _token_cache.set(token, payload)
+    return dict(payload)
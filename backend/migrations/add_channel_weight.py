@@ -0,0 +1,41 @@
+"""
+添加渠道负载均衡权重字段
+
+运行方式：
+python migrations/add_channel_weight.py
+
+应用启动时 init_db 也会自动补齐该字段，此脚本用于不启动应用时手动升级
+"""
+import asyncio
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine
+
+
+async def migrate():
+    """执行迁移"""
+    async with engine.begin() as conn:
+        # 检查列是否已存在
+        result = await conn.execute(
+            text("PRAGMA table_info(channels)")
+        )
+        columns = [row[1] for row in result.fetchall()]
+
+        if 'weight' not in columns:
+            print("添加 weight 字段...")
+            # 为空时按 rpm_limit 计算权重，现有渠道无需回填
+            await conn.execute(
+                text("ALTER TABLE channels ADD COLUMN weight INTEGER")
+            )
+            print("迁移完成！")
+        else:
+            print("weight 字段已存在，跳过迁移")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,40 @@
+"""
+添加日志查询组合索引
+
+运行方式：
+python migrations/add_chat_log_indexes.py
+"""
+import asyncio
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine
+
+NEW_INDEXES = {
+    "ix_chat_logs_ip_created": "chat_logs (ip_address, created_at)",
+    "ix_chat_logs_model_created": "chat_logs (model_id, created_at)",
+}
+
+# 被组合索引前缀覆盖的旧索引
+DROPPED_INDEXES = ["ix_chat_logs_ip_address"]
+
+
+async def migrate():
+    """执行迁移"""
+    async with engine.begin() as conn:
+        for name, definition in NEW_INDEXES.items():
+            print(f"创建索引 {name}...")
+            await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
+        for name in DROPPED_INDEXES:
+            print(f"删除索引 {name}...")
+            await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        await conn.execute(text("ANALYZE chat_logs"))
+    print("迁移完成！")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,49 @@
+"""
+添加日志耗时与调用结果字段
+
+运行方式：
+python migrations/add_chat_log_latency.py
+
+应用启动时 init_db 也会自动补齐这些字段，此脚本用于不启动应用时手动升级
+"""
+import asyncio
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine
+
+NEW_COLUMNS = {
+    "duration_ms": "INTEGER",
+    "ttft_ms": "INTEGER",
+    "upstream_status": "INTEGER",
+    "error_type": "VARCHAR(64)",
+}
+
+
+async def migrate():
+    """执行迁移"""
+    async with engine.begin() as conn:
+        # 检查列是否已存在
+        result = await conn.execute(
+            text("PRAGMA table_info(chat_logs)")
+        )
+        columns = [row[1] for row in result.fetchall()]
+
+        missing = [name for name in NEW_COLUMNS if name not in columns]
+        if missing:
+            for name in missing:
+                print(f"添加 {name} 字段...")
+                await conn.execute(
+                    text(f"ALTER TABLE chat_logs ADD COLUMN {name} {NEW_COLUMNS[name]}")
+                )
+            print("迁移完成！")
+        else:
+            print("字段已存在，跳过迁移")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
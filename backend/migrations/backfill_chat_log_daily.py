@@ -0,0 +1,33 @@
+"""
+根据现有日志重建按天汇总表 chat_log_daily
+
+运行方式：
+python migrations/backfill_chat_log_daily.py
+
+重建期间持有数据库写锁，运行中的应用写日志会等待（超过 busy_timeout 后按日志写入器的重试设置重试）；
+日志量很大时建议停止应用或在低峰期执行
+"""
+import asyncio
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import init_db, AsyncSessionLocal
+from app.services.usage_rollup import UsageRollup
+
+
+async def migrate():
+    """执行迁移"""
+    # 确保汇总表已创建
+    await init_db()
+
+    async with AsyncSessionLocal() as db:
+        print("重建 chat_log_daily 汇总表...")
+        total = await UsageRollup.backfill(db)
+        print(f"迁移完成！共汇总 {total} 条日志")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
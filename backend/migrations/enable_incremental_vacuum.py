@@ -0,0 +1,40 @@
+"""
+为已有数据库开启增量回收（auto_vacuum=INCREMENTAL）
+
+切换模式需要执行一次 VACUUM 重写整个数据库文件，期间会锁库，
+请在停机或低峰期运行，并确保磁盘剩余空间不少于数据库文件大小。
+
+运行方式：
+python migrations/enable_incremental_vacuum.py
+"""
+import asyncio
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine
+
+INCREMENTAL = 2
+
+
+async def migrate():
+    """执行迁移"""
+    async with engine.connect() as conn:
+        # VACUUM 不能在事务中执行
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        result = await conn.execute(text("PRAGMA auto_vacuum"))
+        if result.scalar() == INCREMENTAL:
+            print("已是增量回收模式，跳过迁移")
+            return
+
+        await conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+        print("执行 VACUUM，重写数据库文件...")
+        await conn.execute(text("VACUUM"))
+        print("迁移完成！")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
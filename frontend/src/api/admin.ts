@@ -67,11 +67,20 @@ export const adminApi = {
     model_id?: string
     limit?: number
     offset?: number
+    cursor?: string
   }) {
     return api.get<ChatLog[]>('/admin/logs', { params })
   },
 
-  exportLogs(params?: { start_date?: string; end_date?: string }) {
+  exportLogs(params?: {
+    start_date?: string
+    end_date?: string
+    username?: string
+    ip_address?: string
+    model_id?: string
+    format?: 'csv' | 'ndjson'
+    compress?: boolean
+  }) {
     return api.get('/admin/logs/export', {
       params,
       responseType: 'blob',
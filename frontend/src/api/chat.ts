@@ -52,16 +52,21 @@ export const chatApi = {
       throw new Error('No response body')
     }
 
+    // 一次读取可能包含多帧（服务端合并写出），也可能在行中间截断，不完整的行留到下次处理
+    let buffer = ''
+
     while (true) {
       const { done, value } = await reader.read()
       if (done) break
 
-      const chunk = decoder.decode(value)
-      const lines = chunk.split('\n')
+      buffer += decoder.decode(value, { stream: true })
+      const lines = buffer.split('\n')
+      buffer = lines.pop() ?? ''
 
-      for (const line of lines) {
-        if (line.startsWith('data: ')) {
-          const data = line.slice(6)
+      for (const rawLine of lines) {
+        const line = rawLine.trimEnd()
+        if (line.startsWith('data:')) {
+          const data = line.slice(5).trim()
           if (data === '[DONE]') {
             return
           }